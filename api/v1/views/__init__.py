@@ -18,3 +18,4 @@ from api.v1.views.present_pregnancy import *
 from api.v1.views.antenatal_profile import *
 from api.v1.views.maternal_profile import *
 from api.v1.views.clinical_note import *
+from api.v1.views.monitoring import *
@@ -1,11 +1,12 @@
 """Antenatal profile endpoints."""
 
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import ValidationError, schema, fields
 
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, schema_only
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_or_provider_required
 from models.antenatal_profile import AntenatalProfile
 from models.patient import Patient
@@ -44,7 +45,7 @@ class AntenatalProfileSchema(schema.Schema):
 # create a patient's antenatal profile
 @api_bp.route("/patients/<int:patient_id>/antenatal_profile", methods=["POST"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_antenatal_profile(patient_id):
     """Create a patient's antenatal profile."""
     schema = AntenatalProfileSchema()
@@ -53,7 +54,7 @@ def create_antenatal_profile(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 400
     
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
     
@@ -73,46 +74,43 @@ def create_antenatal_profile(patient_id):
 # get a patient's antenatal profile
 @api_bp.route("/patients/<int:patient_id>/antenatal_profile", methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_antenatal_profile(patient_id):
     """Get a patient's antenatal profile."""
-    antenatal_profile = db.session.query(AntenatalProfile).filter_by(patient_id=patient_id).first()
+    fieldset = requested_fields()
+    antenatal_profile = load_fields(
+        db.session.query(AntenatalProfile), AntenatalProfile, fieldset
+    ).filter_by(patient_id=patient_id).first()
     if not antenatal_profile:
         return jsonify({"message": "Antenatal profile not found."}), 404
     
-    schema = AntenatalProfileSchema()
+    schema = AntenatalProfileSchema(only=schema_only(AntenatalProfileSchema, fieldset))
     return jsonify(schema.dump(antenatal_profile)), 200
 
 
 # get a patient's antenatal profile (self)
 @api_bp.route("/patients/me/antenatal_profile", methods=["GET"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_antenatal_profile_self():
     """Get a patient's antenatal profile."""
-    token = request.headers.get('Authorization')
-    if not token:
-        return jsonify({"message": "Token not found."}), 404
-    if token.startswith('Bearer '):
-        token = token.split()[1]
-
-    patient_id = decode_token(encoded_token=token)["sub"]
-    if not patient_id:
-        return jsonify({"message": "Patient not found."}), 404
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "Patient not found."}), 404
 
-    antenatal_profile = db.session.query(AntenatalProfile).filter_by(patient_id=patient_id).first()
+    fieldset = requested_fields()
+    antenatal_profile = load_fields(
+        db.session.query(AntenatalProfile), AntenatalProfile, fieldset
+    ).filter_by(patient_id=patient.id).first()
     if not antenatal_profile:
         return jsonify({"message": "Antenatal profile not found."}), 404
     
-    schema = AntenatalProfileSchema()
+    schema = AntenatalProfileSchema(only=schema_only(AntenatalProfileSchema, fieldset))
     return jsonify(schema.dump(antenatal_profile)), 200
 
 # update a patient's antenatal profile
 @api_bp.route("/patients/<int:patient_id>/antenatal_profile", methods=["PUT"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_antenatal_profile(patient_id):
     """Update a patient's antenatal profile."""
     schema = AntenatalProfileSchema()
@@ -121,7 +119,7 @@ def update_antenatal_profile(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 400
     
-    antenatal_profile = db.session.query(AntenatalProfile).filter_by(patient_id=patient_id).first()
+    antenatal_profile = db.session.query(AntenatalProfile).filter_by(patient_id=patient.id).first()
     if not antenatal_profile:
         return jsonify({"message": "Antenatal profile not found."}), 404
     
@@ -139,10 +137,10 @@ def update_antenatal_profile(patient_id):
 # delete a patient's antenatal profile
 @api_bp.route("/patients/<int:patient_id>/antenatal_profile", methods=["DELETE"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_antenatal_profile(patient_id):
     """Delete a patient's antenatal profile."""
-    antenatal_profile = db.session.query(AntenatalProfile).filter_by(patient_id=patient_id).first()
+    antenatal_profile = db.session.query(AntenatalProfile).filter_by(patient_id=patient.id).first()
     if not antenatal_profile:
         return jsonify({"message": "Antenatal profile not found."}), 404
     
@@ -4,12 +4,14 @@ from datetime import datetime
 from flask import jsonify, request
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields
+from api.v1.views.pagination import filter_range, paginate
 from api.v1.views.user import admin_required
 from api.v1.views.patient import (
     admin_or_provider_required,
     patient_required,
-    #token_required,
 )
+from auth.identity import current_identity
 from models.appointment import Appointment
 from models.user import User
 from models.patient import Patient
@@ -17,23 +19,49 @@ from models.patient import Patient
 time = "%Y-%m-%dT%H:%M:%S"
 
 
+def appointment_page(query):
+    """Return the response of a page of appointments - helper function.
+
+    Filters: from/to on the appointment date, status and type. Appointments
+    are sorted by date by default. See api/v1/views/pagination.py for the
+    paging parameters and headers, and api/v1/views/fieldsets.py for ?fields=.
+    """
+    fields = requested_fields()
+    query = load_fields(query, Appointment, fields)
+    query = filter_range(query, Appointment.appointment_date, "from", "to")
+    for arg, column in [
+        ("status", Appointment.appointment_status),
+        ("type", Appointment.appointment_type),
+    ]:
+        if request.args.get(arg):
+            query = query.filter(column == request.args[arg])
+    appointments, headers = paginate(
+        Appointment,
+        query,
+        sorts={"appointment_date": Appointment.appointment_date},
+        default_sort="appointment_date",
+    )
+    return (
+        jsonify([appointment.to_dict(fields) for appointment in appointments]),
+        200,
+        headers,
+    )
+
+
 @api_bp.route("/appointments", methods=["GET"], strict_slashes=False)
-#@token_required(User)
 @admin_or_provider_required
-def get_all_appointments(current_user):
+def get_all_appointments():
     """Get all appointments"""
-    appointments = db.session.query(Appointment).all()
-    return jsonify([appointment.to_dict() for appointment in appointments]), 200
+    return appointment_page(db.session.query(Appointment))
 
 
 # create an appointment
 @api_bp.route("/appointments", methods=["POST"], strict_slashes=False)
-#@token_required(User)
 @admin_or_provider_required
-def create_appointment(current_user):
+def create_appointment():
     """Create an appointment"""
     data = request.get_json()
-    data["user_id"] = current_user.id
+    data["user_id"] = current_identity.id
     appointment = Appointment(**data)
     appointment.save()
     return jsonify(appointment.to_dict()), 201
@@ -43,11 +71,10 @@ def create_appointment(current_user):
 @api_bp.route(
     "/appointments/<int:appointment_id>", methods=["PUT"], strict_slashes=False
 )
-#@token_required(User)
 @admin_or_provider_required
-def update_appointment(current_user, appointment_id):
+def update_appointment(appointment_id):
     """Update an appointment"""
-    appointment = db.session.query(Appointment).get(appointment_id)
+    appointment = db.session.get(Appointment, appointment_id)
     if not appointment:
         return jsonify({"error": "Appointment not found"}), 404
     data = request.get_json()
@@ -70,11 +97,10 @@ def update_appointment(current_user, appointment_id):
 @api_bp.route(
     "/appointments/<int:appointment_id>", methods=["DELETE"], strict_slashes=False
 )
-#@token_required(User)
 @admin_or_provider_required
-def delete_appointment(current_user, appointment_id):
+def delete_appointment(appointment_id):
     """Delete an appointment"""
-    appointment = db.session.query(Appointment).get(appointment_id)
+    appointment = db.session.get(Appointment, appointment_id)
     if not appointment:
         return jsonify({"error": "Appointment not found"}), 404
     db.session.delete(appointment)
@@ -86,45 +112,39 @@ def delete_appointment(current_user, appointment_id):
 @api_bp.route(
     "/appointments/patient/<int:patient_id>", methods=["GET"], strict_slashes=False
 )
-#@token_required(User)
 @admin_or_provider_required
-def get_patient_appointments(current_user, patient_id):
+def get_patient_appointments(patient_id):
     """Get all appointments for a patient"""
-    appointments = db.session.query(Appointment).filter_by(patient_id=patient_id).all()
-    return jsonify([appointment.to_dict() for appointment in appointments]), 200
+    return appointment_page(
+        db.session.query(Appointment).filter_by(patient_id=patient_id)
+    )
 
 
 # get all appointments for a patient (self)
 @api_bp.route("/appointments/patient/me", methods=["GET"], strict_slashes=False)
-#@token_required(Patient)
 @patient_required
-def get_patient_self_appointments(current_user):
+def get_patient_self_appointments():
     """Get all appointments for a patient"""
-    appointments = (
-        db.session.query(Appointment).filter_by(patient_id=current_user.id).all()
+    return appointment_page(
+        db.session.query(Appointment).filter_by(patient_id=current_identity.id)
     )
-    return jsonify([appointment.to_dict() for appointment in appointments]), 200
 
 
 # request for reschedule for an appointment by patient---TODO
 
 # get all appointments for a user
 @api_bp.route("/appointments/user/<int:user_id>", methods=["GET"], strict_slashes=False)
-#@token_required(User)
 @admin_or_provider_required
-def get_user_appointments(current_user, user_id):
+def get_user_appointments(user_id):
     """Get all appointments for a user"""
-    appointments = db.session.query(Appointment).filter_by(user_id=user_id).all()
-    return jsonify([appointment.to_dict() for appointment in appointments]), 200
+    return appointment_page(db.session.query(Appointment).filter_by(user_id=user_id))
 
 
 # get all appointments for a user (self)
 @api_bp.route("/appointments/user/me", methods=["GET"], strict_slashes=False)
-#@token_required(User)
 @admin_or_provider_required
-def get_user_self_appointments(current_user):
+def get_user_self_appointments():
     """Get all appointments for a user"""
-    appointments = (
-        db.session.query(Appointment).filter_by(user_id=current_user.id).all()
+    return appointment_page(
+        db.session.query(Appointment).filter_by(user_id=current_identity.id)
     )
-    return jsonify([appointment.to_dict() for appointment in appointments]), 200
@@ -1,11 +1,12 @@
 """Clinical Note Endpoints."""
 
 from flask import jsonify, request
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import ValidationError, schema, fields
 
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, schema_only
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_or_provider_required
 from models.clinical_note import ClinicalNote
 from models.patient import Patient
@@ -26,7 +27,7 @@ class ClinicalNoteSchema(schema.Schema):
 # create a patient's clinical note
 @api_bp.route("/patients/<int:patient_id>/clinical_notes", methods=["POST"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_clinical_note(patient_id):
     """Create a patient's clinical note."""
     schema = ClinicalNoteSchema()
@@ -35,7 +36,7 @@ def create_clinical_note(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 400
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
 
@@ -56,52 +57,58 @@ def create_clinical_note(patient_id):
 # get a patient's clinical notes
 @api_bp.route("/patients/<int:patient_id>/clinical_notes", methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_clinical_note(patient_id):
     """Get a patient's clinical note."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
 
-    clinical_notes = patient.clinical_notes
+    fieldset = requested_fields()
+    clinical_notes = (
+        load_fields(db.session.query(ClinicalNote), ClinicalNote, fieldset)
+        .filter_by(patient_id=patient.id)
+        .order_by(ClinicalNote.id)
+        .all()
+    )
     if not clinical_notes:
         return jsonify({"message": "Clinical notes not found."}), 404
 
-    schema = ClinicalNoteSchema(many=True)
+    schema = ClinicalNoteSchema(
+        many=True, only=schema_only(ClinicalNoteSchema, fieldset)
+    )
     return jsonify(schema.dump(clinical_notes)), 200
 
 
 # get a patient's clinical notes  (self)
 @api_bp.route("/patients/me/clinical_notes", methods=["GET"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_clinical_note_self():
     """Get a patient's clinical note."""
-    token = request.headers.get('Authorization')
-    if not token:
-        return jsonify({"message": "Token not found."}), 404
-    if token.startswith('Bearer '):
-        token = token.split()[1]
-
-    patient_id = decode_token(encoded_token=token)["sub"]
-    if not patient_id:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "Patient not found."}), 404
 
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
-        return jsonify({"message": "Patient not found."}), 404
-
-    clinical_notes = patient.clinical_notes
+    fieldset = requested_fields()
+    clinical_notes = (
+        load_fields(db.session.query(ClinicalNote), ClinicalNote, fieldset)
+        .filter_by(patient_id=patient.id)
+        .order_by(ClinicalNote.id)
+        .all()
+    )
     if not clinical_notes:
         return jsonify({"message": "Clinical notes not found."}), 404
 
-    schema = ClinicalNoteSchema(many=True)
+    schema = ClinicalNoteSchema(
+        many=True, only=schema_only(ClinicalNoteSchema, fieldset)
+    )
     return jsonify(schema.dump(clinical_notes)), 200
 
 
 # update a patient's clinical note
 @api_bp.route("/patients/<int:patient_id>/clinical_notes/<int:clinical_note_id>", methods=["PUT"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_clinical_note(patient_id, clinical_note_id):
     """Update a patient's clinical note."""
     schema = ClinicalNoteSchema()
@@ -110,11 +117,11 @@ def update_clinical_note(patient_id, clinical_note_id):
     except ValidationError as err:
         return jsonify(err.messages), 400
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
 
-    clinical_note = db.session.query(ClinicalNote).get(clinical_note_id)
+    clinical_note = db.session.get(ClinicalNote, clinical_note_id)
     if not clinical_note:
         return jsonify({"message": "Clinical note not found."}), 404
 
@@ -129,14 +136,14 @@ def update_clinical_note(patient_id, clinical_note_id):
 # delete a patient's clinical note
 @api_bp.route("/patients/<int:patient_id>/clinical_notes/<int:clinical_note_id>", methods=["DELETE"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_clinical_note(patient_id, clinical_note_id):
     """Delete a patient's clinical note."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
 
-    clinical_note = db.session.query(ClinicalNote).get(clinical_note_id)
+    clinical_note = db.session.get(ClinicalNote, clinical_note_id)
     if not clinical_note:
         return jsonify({"message": "Clinical note not found."}), 404
 
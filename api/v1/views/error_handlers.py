@@ -67,7 +67,10 @@ def conflict(error):
 @api_bp.errorhandler(429)
 def too_many_requests(error):
     """ Error handler for 429 """
-    return jsonify({"error": error.description}), 429
+    headers = {}
+    if getattr(error, "retry_after", None):
+        headers["Retry-After"] = str(error.retry_after)
+    return jsonify({"error": error.description}), 429, headers
 
 
 # ----- server side errors -----#
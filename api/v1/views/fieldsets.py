@@ -0,0 +1,64 @@
+"""Sparse fieldsets for the list and detail endpoints.
+
+``fields`` is a comma-separated list of the names a client wants, e.g.
+``?fields=id,first_name,phone_no``. Only the columns behind those names are
+loaded from the database and only those names are serialized; names an
+endpoint does not serialize are ignored. Without it every field is
+returned.
+"""
+
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+
+def requested_fields():
+    """Return the set of names the request asks for, or None for all."""
+    value = request.args.get("fields")
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def wants(fields, name) -> bool:
+    """Return whether a field is to be serialized."""
+    return fields is None or name in fields
+
+
+def load_fields(query, cls, fields, *needed):
+    """Load only the columns of cls behind the requested fields.
+
+    Args:
+        query (Query): A query of cls.
+        cls (type): The model the fields belong to.
+        fields (set): The requested fields, None for all.
+        *needed (str): Columns to load anyway, e.g. those a computed field
+            is derived from.
+
+    Returns:
+        Query: The query, loading only those columns and the primary key.
+    """
+    if fields is None:
+        return query
+    mapper = inspect(cls)
+    names = set(fields) | set(needed)
+    names.update(mapper.get_property_by_column(c).key for c in mapper.primary_key)
+    columns = [
+        getattr(cls, attr.key) for attr in mapper.column_attrs if attr.key in names
+    ]
+    return query.options(load_only(*columns))
+
+
+def schema_only(schema_class, fields):
+    """Return the ``only`` argument of a schema for the requested fields.
+
+    Args:
+        schema_class (type): A marshmallow schema.
+        fields (set): The requested fields, None for all.
+
+    Returns:
+        list: The schema's fields among those requested, or None for all.
+    """
+    if fields is None:
+        return None
+    return [name for name in schema_class._declared_fields if name in fields]
@@ -1,11 +1,12 @@
 """First visit examination endpoints."""
 
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import ValidationError, schema, fields
 
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, schema_only
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_or_provider_required
 from models.first_visit_examination import PhysicalExaminationFirstVisit
 from models.patient import Patient
@@ -38,14 +39,21 @@ class PhysicalExaminationFirstVisitSchema(schema.Schema):
     '/patients/<int:patient_id>/first_visit_examination', methods=['GET'], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_first_visit_examination(patient_id):
     """Get first visit examination for a specific patient."""
-    first_visit_examination = db.session.query(PhysicalExaminationFirstVisit).filter_by(patient_id=patient_id).first()
+    fieldset = requested_fields()
+    first_visit_examination = load_fields(
+        db.session.query(PhysicalExaminationFirstVisit),
+        PhysicalExaminationFirstVisit,
+        fieldset,
+    ).filter_by(patient_id=patient_id).first()
     if not first_visit_examination:
         return jsonify({'message': 'First visit examination not found'}), 404
 
-    schema = PhysicalExaminationFirstVisitSchema()
+    schema = PhysicalExaminationFirstVisitSchema(
+        only=schema_only(PhysicalExaminationFirstVisitSchema, fieldset)
+    )
     return jsonify(schema.dump(first_visit_examination)), 200
 
 # GET /patients/me/first_visit_examination
@@ -53,24 +61,25 @@ def get_first_visit_examination(patient_id):
 @api_bp.route(
     '/patients/me/first_visit_examination', methods=['GET'], strict_slashes=False
 )
-@jwt_required()
+@token_required()
 def get_first_visit_examination_for_logged_in_patient():
     """Get first visit examination for logged in patient."""
-    token = request.headers.get("Authorization")
-    if not token:
-        return jsonify({"message": "Missing authorization header"}), 401
-
-    token = token.split(" ")[1]
-    patient_id = decode_token(token)["sub"]
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "User not found"}), 404
     
-    first_visit_examination = db.session.query(PhysicalExaminationFirstVisit).filter_by(patient_id=patient_id).first()
+    fieldset = requested_fields()
+    first_visit_examination = load_fields(
+        db.session.query(PhysicalExaminationFirstVisit),
+        PhysicalExaminationFirstVisit,
+        fieldset,
+    ).filter_by(patient_id=patient.id).first()
     if not first_visit_examination:
         return jsonify({'message': 'First visit examination not found'}), 404
     
-    schema = PhysicalExaminationFirstVisitSchema()
+    schema = PhysicalExaminationFirstVisitSchema(
+        only=schema_only(PhysicalExaminationFirstVisitSchema, fieldset)
+    )
     return jsonify(schema.dump(first_visit_examination)), 200
 
 
@@ -82,7 +91,7 @@ def get_first_visit_examination_for_logged_in_patient():
     '/patients/<int:patient_id>/first_visit_examination', methods=['POST'], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_first_visit_examination(patient_id):
     """Create a first visit examination for a specific patient."""
     schema = PhysicalExaminationFirstVisitSchema()
@@ -91,7 +100,7 @@ def create_first_visit_examination(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 422
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -118,7 +127,7 @@ def create_first_visit_examination(patient_id):
     '/patients/<int:patient_id>/first_visit_examination', methods=['PUT'], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_first_visit_examination(patient_id):
     """Update a first visit examination for a specific patient."""
     schema = PhysicalExaminationFirstVisitSchema()
@@ -127,7 +136,7 @@ def update_first_visit_examination(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 422
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -149,10 +158,10 @@ def update_first_visit_examination(patient_id):
     '/patients/<int:patient_id>/first_visit_examination', methods=['DELETE'], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_first_visit_examination(patient_id):
     """Delete a first visit examination for a specific patient."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -4,6 +4,8 @@ from flask import jsonify, request, abort
 
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields
+from api.v1.views.pagination import paginate
 from models.location import Location, Tag
 
 from auth.validators import (
@@ -67,16 +69,22 @@ def create_location():
 
 @api_bp.route("/locations", methods=["GET"], strict_slashes=False)
 def get_locations():
-    """Get all locations."""
-    locations = db.session.query(Location).all()
+    """Get a page of locations, optionally those within a parent_id."""
+    fields = requested_fields()
+    query = load_fields(db.session.query(Location), Location, fields)
+    query = Location.with_parent_and_tag(query, fields)
+    if request.args.get("parent_id"):
+        query = query.filter(Location.parent_id == request.args["parent_id"])
+    locations, headers = paginate(Location, query)
     return (
         jsonify(
             {
                 "message": "Locations retrieved successfully.",
-                "locations": [location.to_dict() for location in locations],
+                "locations": [location.to_dict(fields) for location in locations],
             }
         ),
         200,
+        headers,
     )
 
 
@@ -84,20 +92,26 @@ def get_locations():
     "/locations/tags/<string:tag_name>", methods=["GET"], strict_slashes=False
 )
 def get_locations_by_tag(tag_name):
-    """Get all locations by tag."""
+    """Get a page of the locations of a tag, optionally within a parent_id."""
     tag = db.session.query(Tag).filter_by(name=tag_name.lower()).first()
     if not tag:
         abort(404, "Tag does not exist.")
 
-    locations = db.session.query(Location).filter_by(tag=tag).all()
+    fields = requested_fields()
+    query = load_fields(db.session.query(Location), Location, fields)
+    query = Location.with_parent_and_tag(query.filter_by(tag=tag), fields)
+    if request.args.get("parent_id"):
+        query = query.filter(Location.parent_id == request.args["parent_id"])
+    locations, headers = paginate(Location, query)
     return (
         jsonify(
             {
                 "message": "Locations retrieved successfully.",
-                "locations": [location.to_dict() for location in locations],
+                "locations": [location.to_dict(fields) for location in locations],
             }
         ),
         200,
+        headers,
     )
 
 
@@ -112,8 +126,10 @@ def get_location_by_tag_and_name(tag_name, location_name):
     if not tag:
         abort(404, "Tag does not exist.")
 
+    fields = requested_fields()
+    query = load_fields(db.session.query(Location), Location, fields)
     location = (
-        db.session.query(Location)
+        Location.with_parent_and_tag(query, fields)
         .filter_by(name=location_name.lower(), tag=tag)
         .first()
     )
@@ -124,7 +140,7 @@ def get_location_by_tag_and_name(tag_name, location_name):
         jsonify(
             {
                 "message": "Location retrieved successfully.",
-                "location": location.to_dict(),
+                "location": location.to_dict(fields),
             }
         ),
         200,
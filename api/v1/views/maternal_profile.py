@@ -1,11 +1,12 @@
 """Maternal profile endpoints."""
 
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import ValidationError, schema, fields
 
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, schema_only, wants
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_or_provider_required
 from models.maternal_profile import MaternalProfile
 from models.patient import Patient
@@ -27,7 +28,7 @@ class MaternalProfileSchema(schema.Schema):
 # create a patient's maternal profile
 @api_bp.route("/patients/<int:patient_id>/maternal_profile", methods=["POST"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_maternal_profile(patient_id):
     """Create a patient's maternal profile."""
     schema = MaternalProfileSchema()
@@ -36,7 +37,7 @@ def create_maternal_profile(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 400
     
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
     
@@ -54,65 +55,57 @@ def create_maternal_profile(patient_id):
     return jsonify({"message": "Maternal profile created successfully."}), 201
 
 
+def maternal_profile_response(patient):
+    """Return the response of a patient's maternal profile - helper function."""
+    fieldset = requested_fields()
+    needed = ["patient_id"] if wants(fieldset, "age") else []
+    if wants(fieldset, "edd"):
+        needed.append("lmp")
+    maternal_profile = load_fields(
+        db.session.query(MaternalProfile), MaternalProfile, fieldset, *needed
+    ).filter_by(patient_id=patient.id).first()
+    if not maternal_profile:
+        return jsonify({"message": "Maternal profile not found."}), 404
+
+    schema = MaternalProfileSchema(only=schema_only(MaternalProfileSchema, fieldset))
+    maternal_profile_dict = schema.dump(maternal_profile)
+    if wants(fieldset, "age"):
+        age = maternal_profile.age
+        maternal_profile_dict['age'] = age if age else None
+    if wants(fieldset, "edd"):
+        edd = maternal_profile.edd
+        maternal_profile_dict['edd'] = edd.isoformat() if edd else None
+    return jsonify(maternal_profile_dict), 200
+
+
 # get a patient's maternal profile
 @api_bp.route("/patients/<int:patient_id>/maternal_profile", methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_maternal_profile(patient_id):
     """Get a patient's maternal profile."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
 
-    maternal_profile = patient.maternal_profile
-    if not maternal_profile:
-        return jsonify({"message": "Maternal profile not found."}), 404
-
-    age = maternal_profile.age
-    edd = maternal_profile.edd
-
-    schema = MaternalProfileSchema()
-    maternal_profile_dict = schema.dump(maternal_profile)
-    maternal_profile_dict['age'] = age if age else None
-    maternal_profile_dict['edd'] = edd.isoformat() if edd else None
-    return jsonify(maternal_profile_dict), 200
+    return maternal_profile_response(patient)
 
 # get a patient's maternal profile (self)
 @api_bp.route("/patients/me/maternal_profile", methods=["GET"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_maternal_profile_self():
     """Get a patient's maternal profile."""
-    token = request.headers.get('Authorization')
-    if not token:
-        return jsonify({"message": "Token not found."}), 404
-    if token.startswith('Bearer '):
-        token = token.split()[1]
-
-    patient_id = decode_token(encoded_token=token)["sub"]
-    if not patient_id:
-        return jsonify({"message": "Patient not found."}), 404
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "Patient not found."}), 404
 
-    maternal_profile = patient.maternal_profile
-    if not maternal_profile:
-        return jsonify({"message": "Maternal profile not found."}), 404
-
-    age = maternal_profile.age
-    edd = maternal_profile.edd
-
-    schema = MaternalProfileSchema()
-    maternal_profile_dict = schema.dump(maternal_profile)
-    maternal_profile_dict['age'] = age if age else None
-    maternal_profile_dict['edd'] = edd.isoformat() if edd else None
-    return jsonify(maternal_profile_dict), 200
+    return maternal_profile_response(patient)
 
 
 # update a patient's maternal profile
 @api_bp.route("/patients/<int:patient_id>/maternal_profile", methods=["PUT"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_maternal_profile(patient_id):
     """Update a patient's maternal profile."""
     schema = MaternalProfileSchema()
@@ -121,7 +114,7 @@ def update_maternal_profile(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 400
     
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
     
@@ -140,10 +133,10 @@ def update_maternal_profile(patient_id):
 # delete a patient's maternal profile
 @api_bp.route("/patients/<int:patient_id>/maternal_profile", methods=["DELETE"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_maternal_profile(patient_id):
     """Delete a patient's maternal profile."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found."}), 404
     
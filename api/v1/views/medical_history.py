@@ -1,9 +1,10 @@
 """Module for medical history endpoints."""
 
 from flask import jsonify, request, abort
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import Schema, fields, ValidationError
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_required, admin_or_provider_required
 from app import db
 from models.medical_history import MedicalHistory
@@ -29,7 +30,7 @@ class MedicalHistorySchema(Schema):
     "/patients/<int:patient_id>/medical-history", methods=["POST"], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_medical_history(patient_id):
     """Create a patient's medical history."""
 
@@ -39,7 +40,7 @@ def create_medical_history(patient_id):
     except ValidationError as err:
         return jsonify({"message": "Invalid input data", "errors": err.messages}), 400
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -63,42 +64,42 @@ def create_medical_history(patient_id):
     "/patients/<int:patient_id>/medical-history", methods=["GET"], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_medical_history(patient_id):
     """Get a patient's medical history."""
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
-    medical_history = patient.medical_history
+    fieldset = requested_fields()
+    medical_history = load_fields(
+        db.session.query(MedicalHistory), MedicalHistory, fieldset
+    ).filter_by(patient_id=patient.id).first()
     if not medical_history:
         return jsonify({"message": "Medical history not found"}), 404
 
-    return jsonify(medical_history.to_dict()), 200
+    return jsonify(medical_history.to_dict(fieldset)), 200
 
 
 # get a patient's medical history (self)
 @api_bp.route("/patients/me/medical-history", methods=["GET"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_medical_history_self():
     """Get a patient's medical history."""
 
-    token = request.headers.get("Authorization")
-    if not token:
-        return jsonify({"message": "Missing authorization header"}), 401
-
-    token = token.split(" ")[1]
-    patient_id = decode_token(token)["sub"]
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "User not found"}), 404
 
-    medical_history = patient.medical_history
+    fieldset = requested_fields()
+    medical_history = load_fields(
+        db.session.query(MedicalHistory), MedicalHistory, fieldset
+    ).filter_by(patient_id=patient.id).first()
     if not medical_history:
         return jsonify({"message": "Medical history not found"}), 404
 
-    return jsonify(medical_history.to_dict()), 200
+    return jsonify(medical_history.to_dict(fieldset)), 200
 
 
 # update a patient's medical history
@@ -106,7 +107,7 @@ def get_medical_history_self():
     "/patients/<int:patient_id>/medical-history", methods=["PUT"], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_medical_history(patient_id):
     """Update a patient's medical history."""
     schema = MedicalHistorySchema()
@@ -115,7 +116,7 @@ def update_medical_history(patient_id):
     except ValidationError as err:
         return jsonify({"message": "Invalid input data", "erors": err.messages}), 400
 
-    patient = db.session.query(Patient).get(patient_id),
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -134,10 +135,10 @@ def update_medical_history(patient_id):
     strict_slashes=False,
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_medical_history(patient_id):
     """Delete a patient's medical history."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
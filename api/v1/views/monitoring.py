@@ -0,0 +1,16 @@
+"""Monitoring endpoints for administrators."""
+
+from flask import jsonify
+from api.v1.views import api_bp
+from api.v1.views.user import admin_required
+from auth.identity import token_required
+from storage.pool import pool_metrics
+
+
+# state and counters of the database connection pools of this worker
+@api_bp.route("/stats/db-pool", methods=["GET"], strict_slashes=False)
+@admin_required
+@token_required()
+def get_db_pool_stats():
+    """Return the connection pool metrics of the worker serving the request."""
+    return jsonify(pool_metrics.snapshot()), 200
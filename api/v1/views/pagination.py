@@ -0,0 +1,178 @@
+"""Pagination and filtering helpers for the list endpoints.
+
+A list endpoint returns one page of results as a JSON array. The page is
+chosen by the query string:
+
+    limit   results per page, at most ``PAGE_SIZE_MAX``
+            (``PAGE_SIZE_DEFAULT`` if not given)
+    sort    one of the endpoint's sort keys, usually "id" by default
+    order   "asc" (default) or "desc"
+    cursor  the ``X-Next-Cursor`` of the previous page
+
+The cursor of the next page comes back in the ``X-Next-Cursor`` header and
+as a ``Link: <url>; rel="next"`` header. Neither is sent on the last page.
+The first page also carries ``X-Total-Estimate``, a cheap estimate of the
+number of matching results.
+"""
+
+import base64
+import binascii
+from datetime import date, datetime
+import json
+from urllib.parse import urlencode
+
+from flask import abort, current_app, request
+from sqlalchemy import Date, DateTime
+from sqlalchemy.orm import undefer
+
+from storage import storage
+
+time = "%Y-%m-%dT%H:%M:%S"
+
+
+def encode_cursor(sort, order, after) -> str:
+    """Return the opaque cursor of the page that starts after a result.
+
+    Args:
+        sort (str): The sort key of the pages.
+        order (str): "asc" or "desc".
+        after: The id of the last result, or its (sort value, id) pair.
+
+    Returns:
+        str: The cursor.
+    """
+    if isinstance(after, tuple):
+        after = [
+            value.isoformat() if isinstance(value, (date, datetime)) else value
+            for value in after
+        ]
+    data = json.dumps({"sort": sort, "order": order, "after": after})
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort, order, column=None):
+    """Return the id, or (sort value, id) pair, a cursor starts after.
+
+    Aborts with 400 if the cursor is malformed or was issued for another
+    sort key or order.
+
+    Args:
+        cursor (str): A cursor from ``encode_cursor``.
+        sort (str): The sort key of the request.
+        order (str): The order of the request.
+        column (InstrumentedAttribute, optional): The column behind sort,
+            None for the id.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if (data["sort"], data["order"]) != (sort, order):
+            abort(400, "The cursor belongs to another sort or order")
+        after = data["after"]
+        if column is None:
+            return int(after)
+        value, id = after
+        if isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif isinstance(column.type, Date):
+            value = date.fromisoformat(value)
+        return value, int(id)
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        abort(400, f"Invalid cursor: {cursor}")
+
+
+def date_arg(name):
+    """Return a date query parameter as a datetime, or None if absent.
+
+    Accepts YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS; aborts with 400 otherwise.
+
+    Args:
+        name (str): The query parameter.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
+    for date_format in (time, "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    abort(400, f"Invalid date: {value}, date format should be YYYY-MM-DD")
+
+
+def filter_range(query, column, start_arg, end_arg):
+    """Restrict a query to the dates given in two query parameters.
+
+    The start is inclusive and the end exclusive, so ``from=2024-05-01&
+    to=2024-05-02`` covers all of May 1st.
+
+    Args:
+        query (Query): The query to filter.
+        column (InstrumentedAttribute): The date column to filter on.
+        start_arg (str): The query parameter of the start.
+        end_arg (str): The query parameter of the end.
+
+    Returns:
+        Query: The filtered query.
+    """
+    start, end = date_arg(start_arg), date_arg(end_arg)
+    if start is not None:
+        query = query.filter(column >= start)
+    if end is not None:
+        query = query.filter(column < end)
+    return query
+
+
+def paginate(cls, query, sorts=None, default_sort="id"):
+    """Return the page of a query the request asks for.
+
+    Args:
+        cls (type): The class the query is of.
+        query (Query): The filtered query of cls, without ordering.
+        sorts (dict, optional): Sort keys besides "id", mapped to the
+            non-nullable columns they order by. Each should be indexed
+            together with the id.
+        default_sort (str, optional): The sort key used when the request
+            gives none. Defaults to "id".
+
+    Returns:
+        tuple: (list of objects, dict of response headers).
+    """
+    sorts = sorts or {}
+    config = current_app.config
+    try:
+        limit = int(request.args.get("limit", config.get("PAGE_SIZE_DEFAULT", 50)))
+    except ValueError:
+        abort(400, f"Invalid limit: {request.args['limit']}")
+    if limit < 1:
+        abort(400, f"Invalid limit: {limit}")
+    limit = min(limit, config.get("PAGE_SIZE_MAX", 500))
+
+    sort = request.args.get("sort", default_sort)
+    if sort != "id" and sort not in sorts:
+        abort(400, f"Invalid sort: {sort}, expected one of id, {', '.join(sorts)}")
+    order = request.args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        abort(400, f"Invalid order: {order}, expected asc or desc")
+    column = sorts.get(sort)
+
+    if column is not None:
+        # the cursor is read from the last result, even under ?fields=
+        query = query.options(undefer(column))
+
+    cursor = request.args.get("cursor")
+    after = decode_cursor(cursor, sort, order, column) if cursor else None
+    items, next_after = storage.page(
+        cls, after_id=after, limit=limit, order=order, query=query, sort=column
+    )
+
+    headers = {}
+    if cursor is None:
+        headers["X-Total-Estimate"] = str(storage.estimate(cls, query))
+    if next_after is not None:
+        next_cursor = encode_cursor(sort, order, next_after)
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return items, headers
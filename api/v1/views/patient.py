@@ -2,14 +2,17 @@
 
 
 from flask import jsonify, request, abort
-from flask_jwt_extended import jwt_required, decode_token
 from functools import wraps
+from sqlalchemy.orm import selectinload
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, wants
+from api.v1.views.pagination import filter_range, paginate
 from models.patient import Patient
 from models.person import Person
 from models.role import Role
 from models.user import User
+from auth.identity import current_identity, token_required
 from auth.validators import valid_date
 
 
@@ -24,25 +27,14 @@ def role_required(*required_roles):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-        # Get the auth token
-            token = request.headers.get("Authorization")
-            if not token:
+            # The token was verified once for this request by load_identity
+            if not current_identity.is_authenticated and current_identity.error is None:
                 return jsonify({"message": "Token is missing"}), 401
-            if token.startswith("Bearer "):  # strip the bearer prefix
-                token = token[7:]
+            current_identity.require()
 
-            current_user_id = decode_token(encoded_token=token)["sub"]
-
-            # Get the current user
-            if current_user_id is None:
-                return (
-                    jsonify(
-                        {"message": "Authentication is required to access this resource"}
-                    ),
-                    401,
-                )
-            current_user = db.session.get(Person, current_user_id)
-            if current_user is None:
+            # Get the current user's roles, from the token while they are current
+            current_user_roles = current_identity.roles
+            if current_user_roles is None:
                 return (
                     jsonify(
                         {"message": "Authentication is required to access this resource"}
@@ -51,10 +43,7 @@ def role_required(*required_roles):
                 )
 
             # Check if the current user has any of the required roles
-            if not any(
-                role in (role.name for role in current_user.roles)
-                for role in required_roles
-            ):
+            if not any(role in current_user_roles for role in required_roles):
                 return (
                     jsonify(
                         {
@@ -90,11 +79,30 @@ admin_or_provider_required = role_required("admin", "provider")
 # requres admin or provider role
 @api_bp.route("/patients", methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_patients():
-    """Return all patients."""
-    patients = db.session.query(Patient).all()
-    return jsonify([patient.to_dict() for patient in patients]), 200
+    """Return a page of patients.
+
+    Filters: sex, location_id, birth_date_from/birth_date_to and
+    created_from/created_to. Sort keys: id, created_at and birth_date. See
+    api/v1/views/pagination.py for the paging parameters and headers, and
+    api/v1/views/fieldsets.py for ?fields=.
+    """
+    fields = requested_fields()
+    query = load_fields(db.session.query(Patient), Patient, fields)
+    if wants(fields, "roles"):
+        query = query.options(selectinload(Patient.roles))
+    for field in ["sex", "location_id"]:
+        if request.args.get(field):
+            query = query.filter(getattr(Patient, field) == request.args[field])
+    query = filter_range(query, Patient.birth_date, "birth_date_from", "birth_date_to")
+    query = filter_range(query, Patient.created_at, "created_from", "created_to")
+    patients, headers = paginate(
+        Patient,
+        query,
+        sorts={"created_at": Patient.created_at, "birth_date": Patient.birth_date},
+    )
+    return jsonify([patient.to_dict(fields) for patient in patients]), 200, headers
 
 
 # endpoint to get a single patient by id
@@ -102,13 +110,15 @@ def get_patients():
 # or patient if logged in user is patient and id matches logged in user's id TODO
 @api_bp.route("/patients/<string:patient_id>", methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_patient(patient_id):
     """Return a single patient."""
-    patient = db.session.query(Patient).get(patient_id)
+    fields = requested_fields()
+    query = load_fields(db.session.query(Patient), Patient, fields)
+    patient = query.filter(Patient.id == patient_id).first()
     if not patient:
         abort(404)
-    return jsonify(patient.to_dict()), 200
+    return jsonify(patient.to_dict(fields)), 200
 
 
 # endpoint to get a single patient by phone_no
@@ -117,35 +127,30 @@ def get_patient(patient_id):
 @api_bp.route("/patients/phone/<string:phone_no>", methods=["GET"], strict_slashes=False)
 @api_bp.route("/patients/phone_no/<string:phone_no>", methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_patient_by_phone_no(phone_no):
     """Return a single patient."""
-    patient = db.session.query(Patient).filter_by(phone_no=phone_no).first()
+    fields = requested_fields()
+    patient = (
+        load_fields(db.session.query(Patient), Patient, fields)
+        .filter_by(phone_no=phone_no)
+        .first()
+    )
     if not patient:
         abort(404)
-    return jsonify(patient.to_dict()), 200
+    return jsonify(patient.to_dict(fields)), 200
 
 
 # get patient's info(self) for the currnet logged in patient
 @api_bp.route("/patients/me", methods=["GET"], strict_slashes=False)
 @patient_required
-@jwt_required()
+@token_required()
 def get_patient_self():
     """Return a single patient."""
-    token = request.headers.get("Authorization")
-    patient = None
-    if token:
-        if token.startswith("Bearer "):
-            token = token[7:]
-        current_user_id = decode_token(encoded_token=token)["sub"]
-        patient = db.session.query(Patient).filter_by(id=current_user_id).first()
-
-    # patient = (
-    #     db.session.query(Patient).filter_by(phone_no=current_user.phone_no).first()
-    # )
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         abort(404)
-    return jsonify(patient.to_dict()), 200
+    return jsonify(patient.to_dict(requested_fields())), 200
 
 
 def get_role(name):
@@ -159,7 +164,7 @@ def get_role(name):
 # requres admin or provider role
 @api_bp.route("/patients", methods=["POST"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_patient():
     """Create a patient."""
     data = request.get_json()
@@ -216,10 +221,10 @@ def create_patient():
 # requres admin or provider role
 @api_bp.route("/patients/<string:patient_id>", methods=["PUT"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_patient(patient_id):
     """Update a patient."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         abort(404)
     data = request.get_json()
@@ -240,10 +245,10 @@ def update_patient(patient_id):
 # requres admin or provider role
 @api_bp.route("/patients/<string:patient_id>", methods=["DELETE"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_patient(patient_id):
     """Delete a patient."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         abort(404)
     db.session.delete(patient)
@@ -1,9 +1,10 @@
 """Module for the PregnancyHistory class's endpoints."""
 
 from flask import jsonify, request, abort
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import Schema, fields, ValidationError
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_required, admin_or_provider_required
 from app import db
 from models.pregnancy_history import PregnancyHistory
@@ -29,7 +30,7 @@ class PregnancyHistorySchema(Schema):
         '/patients/<int:patient_id>/pregnancy-history', methods=['POST'], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_pregnancy_history(patient_id):
     """Create a patient's pregnancy history."""
 
@@ -39,7 +40,7 @@ def create_pregnancy_history(patient_id):
     except ValidationError as err:
         return jsonify({"message": "Invalid input data", "errors": err.messages}), 400
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({'message': 'Patient not found'}), 404
 
@@ -56,50 +57,48 @@ def create_pregnancy_history(patient_id):
 # get a patient's pregnancy history
 @api_bp.route('/patients/<int:patient_id>/pregnancy-history', methods=['GET'], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_pregnancy_history(patient_id):
     """Get a patient's pregnancy history."""
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({'message': 'Patient not found'}), 404
 
-    pregnancy_history = db.session.query(PregnancyHistory).filter_by(patient_id=patient.id).first()
+    fieldset = requested_fields()
+    pregnancy_history = load_fields(
+        db.session.query(PregnancyHistory), PregnancyHistory, fieldset
+    ).filter_by(patient_id=patient.id).first()
     if not pregnancy_history:
         return jsonify({'message': 'Pregnancy history not found'}), 404
 
-    return jsonify(pregnancy_history.to_dict()), 200
+    return jsonify(pregnancy_history.to_dict(fieldset)), 200
 
 
 # get a patient's pregnancy history (self)
 @api_bp.route('/patients/me/pregnancy-history', methods=['GET'], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_pregnancy_history_self():
     """Get a patient's pregnancy history."""
 
-    token = request.headers.get("Authorization")
-    if not token:
-        return jsonify({"message": "Token is missing"}), 401
-    if token.startswith("Bearer "):  # strip the bearer prefix
-        token = token[7:]
-
-    current_user_id = decode_token(encoded_token=token)["sub"]
-
-    patient = db.session.query(Patient).get(current_user_id)
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({'message': 'Patient not found'}), 404
 
-    pregnancy_history = db.session.query(PregnancyHistory).filter_by(patient_id=patient.id).first()
+    fieldset = requested_fields()
+    pregnancy_history = load_fields(
+        db.session.query(PregnancyHistory), PregnancyHistory, fieldset
+    ).filter_by(patient_id=patient.id).first()
     if not pregnancy_history:
         return jsonify({'message': 'Pregnancy history not found'}), 404
 
-    return jsonify(pregnancy_history.to_dict()), 200
+    return jsonify(pregnancy_history.to_dict(fieldset)), 200
 
 
 # update a patient's pregnancy history
 @api_bp.route('/patients/<int:patient_id>/pregnancy-history', methods=['PUT'])
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_pregnancy_history(patient_id):
     """Update a patient's pregnancy history."""
 
@@ -109,7 +108,7 @@ def update_pregnancy_history(patient_id):
     except ValidationError as err:
         return jsonify({"message": "Invalid input data", "errors": err.messages}), 400
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({'message': 'Patient not found'}), 404
 
@@ -128,11 +127,11 @@ def update_pregnancy_history(patient_id):
 # delete a patient's pregnancy history
 @api_bp.route('/patients/<int:patient_id>/pregnancy-history', methods=['DELETE'])
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_pregnancy_history(patient_id):
     """Delete a patient's pregnancy history."""
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({'message': 'Patient not found'}), 404
 
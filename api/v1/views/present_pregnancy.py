@@ -1,10 +1,10 @@
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required, decode_token
 from marshmallow import ValidationError, schema, fields
-from sqlalchemy.exc import NoResultFound
 
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, schema_only
+from auth.identity import current_identity, token_required
 from api.v1.views.patient import admin_or_provider_required
 from models.present_pregnancy import PresentPregnancy
 from models.patient import Patient
@@ -36,39 +36,47 @@ class PresentPregnancySchema(schema.Schema):
         ordered = True
 
 
+def present_pregnancies_dump(patient_id, id=None):
+    """Serialize a patient's present pregnancies, or the one with an id,
+    with the requested fields - helper function."""
+    fieldset = requested_fields()
+    query = load_fields(
+        db.session.query(PresentPregnancy), PresentPregnancy, fieldset
+    ).filter_by(patient_id=patient_id)
+    if id is not None:
+        query = query.filter_by(id=id)
+    schema = PresentPregnancySchema(
+        many=True, only=schema_only(PresentPregnancySchema, fieldset)
+    )
+    return schema.dump(query.order_by(PresentPregnancy.id).all())
+
+
 # GET /patients/{patient_id}/present_pregnancy:
 # This endpoint would return the present pregnancy instances for a specific patient.
 @api_bp.route('/patients/<int:patient_id>/present_pregnancy', methods=['GET'], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_present_pregnancies(patient_id):
     """Get present pregnancies for a specific patient."""
-    try:
-        patient = db.session.query(Patient).get(patient_id)
-    except NoResultFound:
-        return jsonify({'message': 'Patient not found'}), 404
+    if db.session.get(Patient, patient_id) is None:
+        return jsonify({"message": "Patient not found"}), 404
 
-    present_pregnancies = patient.present_pregnancy
-    schema = PresentPregnancySchema(many=True)
-    return jsonify(schema.dump(present_pregnancies))
+    return jsonify(present_pregnancies_dump(patient_id))
 
 
 # GET /patients/{patient_id}/present_pregnancy/<int:id>:
 # This endpoint would return the a present pregnancy instance for a specific patient.
 @api_bp.route('/patients/<int:patient_id>/present_pregnancy/<int:id>', methods=["GET"], strict_slashes=False)
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def get_present_pregnancy_by_id(patient_id, id):
     """Get a present pregnancy instance for a specific patient."""
-    try:
-        patient = db.session.query(Patient).get(patient_id)
-    except NoResultFound:
+    if db.session.get(Patient, patient_id) is None:
         return jsonify({"message": "Patient not found"}), 404
 
-    present_pregnancy = next((pp for pp in patient.present_pregnancy if pp.id == id), None)
+    present_pregnancy = present_pregnancies_dump(patient_id, id)
     if present_pregnancy:
-        schema = PresentPregnancySchema()
-        return jsonify(schema.dump(present_pregnancy)), 200
+        return jsonify(present_pregnancy[0]), 200
     else:
         return jsonify({"message": "Present pregnancy instance not found."}), 404
 
@@ -78,7 +86,7 @@ def get_present_pregnancy_by_id(patient_id, id):
     "/patients/<int:patient_id>/present_pregnancy", methods=["POST"], strict_slashes=False 
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def create_present_pregnacy(patient_id):
     """Create a present pregnacny anc visit record for a patient."""
     schema = PresentPregnancySchema()
@@ -87,7 +95,7 @@ def create_present_pregnacy(patient_id):
     except ValidationError as err:
         return jsonify(err.messages), 422
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -111,7 +119,7 @@ def create_present_pregnacy(patient_id):
     "/patients/<int:patient_id>/present_pregnancy/<int:id>", methods=["PUT"], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def update_present_pregnancy(patient_id, id):
     """Update a present pregnancy instance for a patient."""
     schema = PresentPregnancySchema(partial=True)
@@ -120,7 +128,7 @@ def update_present_pregnancy(patient_id, id):
     except ValidationError as err:
         return jsonify(err.messages), 422
 
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -147,10 +155,10 @@ def update_present_pregnancy(patient_id, id):
     "/patients/<int:patient_id>/present_pregnancy/<int:id>", methods=["DELETE"], strict_slashes=False
 )
 @admin_or_provider_required
-@jwt_required()
+@token_required()
 def delete_present_pregnancy(patient_id, id):
     """Delete a present pregnancy instance for a patient."""
-    patient = db.session.query(Patient).get(patient_id)
+    patient = db.session.get(Patient, patient_id)
     if not patient:
         return jsonify({"message": "Patient not found"}), 404
 
@@ -172,48 +180,27 @@ def delete_present_pregnancy(patient_id, id):
 # GET /patients/me/present_pregnancy:
 # This endpoint would return the present pregnancy instances for the current logged in patient.
 @api_bp.route('/patients/me/present_pregnancy', methods=['GET'], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_present_pregnancies_for_current_patient():
     """Get present pregnancies for the current logged in patient."""
-    token = request.headers.get('Authorization')
-    if not token:
-        return jsonify({"message": "Token not found."}), 404
-    if token.startswith('Bearer '):
-        token = token.split()[1]
-
-    patient_id = decode_token(encoded_token=token)["sub"]
-    if not patient_id:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "Patient not found."}), 404
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
-        return jsonify({"message": "Patient not found."}), 404
-    present_pregnancies = patient.present_pregnancy
-    schema = PresentPregnancySchema(many=True)
-    return jsonify(schema.dump(present_pregnancies))
+    return jsonify(present_pregnancies_dump(patient.id))
 
 
 # GET /patients/me/present_pregnancy/<int:id>:
 # This endpoint would return the a present pregnancy instance for the current logged in patient.
 @api_bp.route('/patients/me/present_pregnancy/<int:id>', methods=["GET"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def get_present_pregnancy_by_id_for_current_patient(id):
     """Get a present pregnancy instance for the current logged in patient."""
-    token = request.headers.get('Authorization')
-    if not token:
-        return jsonify({"message": "Token not found."}), 404
-    if token.startswith('Bearer '):
-        token = token.split()[1]
-
-    patient_id = decode_token(encoded_token=token)["sub"]
-    if not patient_id:
-        return jsonify({"message": "Patient not found."}), 404
-    patient = db.session.query(Patient).get(patient_id)
-    if not patient:
+    patient = current_identity.person
+    if not isinstance(patient, Patient):
         return jsonify({"message": "Patient not found."}), 404
 
-    present_pregnancy = next((pp for pp in patient.present_pregnancy if pp.id == id), None)
+    present_pregnancy = present_pregnancies_dump(patient.id, id)
     if present_pregnancy:
-        schema = PresentPregnancySchema()
-        return jsonify(schema.dump(present_pregnancy)), 200
+        return jsonify(present_pregnancy[0]), 200
     else:
         return jsonify({"message": "Present pregnancy instance not found."}), 404
@@ -2,6 +2,7 @@
 
 from flask import jsonify, request, abort
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields
 from app import db
 from models.role import Role
 
@@ -9,8 +10,9 @@ from models.role import Role
 @api_bp.route("/roles", methods=["GET"], strict_slashes=False)
 def get_roles():
     """Return all roles."""
-    roles = Role.query.all()
-    return jsonify([role.to_dict() for role in roles]), 200
+    fields = requested_fields()
+    roles = load_fields(Role.query, Role, fields).all()
+    return jsonify([role.to_dict(fields) for role in roles]), 200
 
 
 @api_bp.route("/roles", methods=["POST"], strict_slashes=False)
@@ -31,7 +33,7 @@ def create_role():
 def update_role(role_id):
     """Update a role."""
     data = request.get_json()
-    role = db.session.query(Role).get(role_id)
+    role = db.session.get(Role, role_id)
     if role:
         role.name = data["name"]
         db.session.commit()
@@ -43,7 +45,7 @@ def update_role(role_id):
 @api_bp.route("/roles/<role_id>", methods=["DELETE"], strict_slashes=False)
 def delete_role(role_id):
     """Delete a role."""
-    role = db.session.query(Role).get(role_id)
+    role = db.session.get(Role, role_id)
     if role:
         db.session.delete(role)
         db.session.commit()
@@ -55,9 +57,11 @@ def delete_role(role_id):
 @api_bp.route("/roles/<role_id>", methods=["GET"], strict_slashes=False)
 def get_role(role_id):
     """Get a role by id."""
-    role = db.session.query(Role).get(role_id)
+    fields = requested_fields()
+    query = load_fields(db.session.query(Role), Role, fields)
+    role = query.filter(Role.id == role_id).first()
     if role:
-        return jsonify(role.to_dict()), 200
+        return jsonify(role.to_dict(fields)), 200
     else:
         return abort(404)
 
@@ -65,8 +69,11 @@ def get_role(role_id):
 @api_bp.route("/roles/name/<name>", methods=["GET"], strict_slashes=False)
 def get_role_by_name(name):
     """Get a role by name."""
-    role = db.session.query(Role).filter_by(name=name).first()
+    fields = requested_fields()
+    role = (
+        load_fields(db.session.query(Role), Role, fields).filter_by(name=name).first()
+    )
     if role:
-        return jsonify(role.to_dict()), 200
+        return jsonify(role.to_dict(fields)), 200
     else:
         return abort(404)
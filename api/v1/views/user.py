@@ -1,15 +1,19 @@
 """User related endpoints."""
 
 from flask import jsonify, request, abort
-from functools import wraps
+from sqlalchemy.orm import selectinload
 
-from flask_jwt_extended import get_jwt_identity, jwt_required, decode_token
 from app import db
 from api.v1.views import api_bp
+from api.v1.views.fieldsets import load_fields, requested_fields, wants
+from api.v1.views.pagination import paginate
+from api.v1.views.patient import role_required
+from auth.identity import current_identity, token_required
 from models.person import Person
-from models.role import Role
+from models.role import Role, person_role
 from models.user import User
 from auth.validators import valid_date
+from storage import storage
 
 
 admin_role = db.session.query(Role).filter_by(name="admin").first()
@@ -17,49 +21,8 @@ provider_role = db.session.query(Role).filter_by(name="provider").first()
 patient_role = db.session.query(Role).filter_by(name="patient").first()
 
 
-def admin_required(f):
-    """Restrict access to admin users."""
-
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        # Get the auth token
-        token = request.headers.get("Authorization")
-        if not token:
-            return jsonify({"message": "Token is missing"}), 401
-        if token.startswith("Bearer "):  # strip the bearer prefix
-            token = token[7:]
-
-        current_user_id = decode_token(encoded_token=token)["sub"]
-
-        # Get the current user
-        if current_user_id is None:
-            return (
-                jsonify(
-                    {"message": "Authentication is required to access this resource"}
-                ),
-                401,
-            )
-        current_user = db.session.get(User, current_user_id)
-        if current_user is None:
-            return (
-                jsonify(
-                    {"message": "Authentication is required to access this resource"}
-                ),
-                401,
-            )
-
-        # Check if the current user has the 'admin' role
-        if "admin" not in (role.name for role in current_user.roles):
-            return (
-                jsonify(
-                    {"message": "Admin privileges are required to access this resource"}
-                ),
-                403,
-            )
-
-        return f(*args, **kwargs)
-
-    return decorated_function
+# decorator to check if user is admin
+admin_required = role_required("admin")
 
 
 def get_role(name):
@@ -73,17 +36,34 @@ def get_role(name):
 # get all users
 @api_bp.route("/users", methods=["GET"], strict_slashes=False, endpoint="get_users")
 @admin_required
-@jwt_required()
+@token_required()
 def get_users():
-    """Return all users."""
-    users = db.session.query(User).all()
-    return jsonify([user.to_dict() for user in users]), 200
+    """Return a page of users.
+
+    Filters: facility_id and role (a role name). Sort keys: id and
+    created_at. See api/v1/views/pagination.py for the paging parameters
+    and headers, and api/v1/views/fieldsets.py for ?fields=.
+    """
+    fields = requested_fields()
+    query = load_fields(db.session.query(User), User, fields)
+    if wants(fields, "roles"):
+        query = query.options(selectinload(User.roles))
+    if request.args.get("facility_id"):
+        query = query.filter(User.facility_id == request.args["facility_id"])
+    if request.args.get("role"):
+        query = (
+            query.join(person_role, person_role.c.person_id == User.id)
+            .join(Role, Role.id == person_role.c.role_id)
+            .filter(Role.name == request.args["role"].lower())
+        )
+    users, headers = paginate(User, query, sorts={"created_at": User.created_at})
+    return jsonify([user.to_dict(fields) for user in users]), 200, headers
 
 
 # create a user
 @api_bp.route("/users", methods=["POST"], strict_slashes=False, endpoint="create_user")
 @admin_required
-@jwt_required()
+@token_required()
 def create_user():
     """Create a user."""
     data = request.get_json()
@@ -136,7 +116,7 @@ def create_user():
 # TODO what happens if current user wants to update self, and is not admin?
 @api_bp.route("/users/<string:user_id>", methods=["PUT"], strict_slashes=False)
 @admin_required
-@jwt_required()
+@token_required()
 def update_user(user_id):
     """Update a user."""
     data = request.get_json()
@@ -147,93 +127,96 @@ def update_user(user_id):
     if not user:
         abort(404, "User not found")
 
-    if "role" in data:
-        role = user.get_role(data["role"].lower())
-        if role is None:
-            abort(400, f'Invalid role: {data["role"]}')
-        user.assign_role(role)
-        del data["role"]
-
-    if "roles" in data:
-        for role in data["roles"]:
-            role = user.get_role(role)
+    with storage.unit_of_work():
+        if "role" in data:
+            role = user.get_role(data["role"].lower())
             if role is None:
-                abort(400, f"Invalid role: {role}")
+                abort(400, f'Invalid role: {data["role"]}')
             user.assign_role(role)
-        del data["roles"]
+            del data["role"]
 
-    if "remove_role" in data:
-        role = (
-            db.session.query(Role).filter_by(name=data["remove_role"].lower()).first()
-        )
-        if role:
-            user.remove_role(role)
-        else:
-            abort(400, f'Invalid role: {data["remove_role"]}')
-        del data["remove_role"]
+        if "roles" in data:
+            for role in data["roles"]:
+                role = user.get_role(role)
+                if role is None:
+                    abort(400, f"Invalid role: {role}")
+                user.assign_role(role)
+            del data["roles"]
+
+        if "remove_role" in data:
+            role = (
+                db.session.query(Role)
+                .filter_by(name=data["remove_role"].lower())
+                .first()
+            )
+            if role:
+                user.remove_role(role)
+            else:
+                abort(400, f'Invalid role: {data["remove_role"]}')
+            del data["remove_role"]
 
-    user.update(**data)
+        user.update(**data)
     return jsonify(user.to_dict()), 201
 
 
 @api_bp.route("/users/me", methods=["PUT"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def update_current_user():
     """Update the current user."""
     data = request.get_json()
     if not data:
         abort(400, "Invalid data")
 
-    token = request.headers.get("Authorization")
-    if not token:
-        return jsonify({"message": "Token is missing"}), 401
     # Get the current user
-    current_user = db.session.get(User, get_jwt_identity())
-    if current_user is None:
+    current_user = current_identity.person
+    if not isinstance(current_user, User):
         return (
             jsonify({"message": "Authentication is required to access this resource"}),
             401,
         )
 
-    if "role" in data:
-        user_has_role = current_user.get_role(data["role"].lower())
-        if user_has_role:
-            del data["role"]
-        else:
-            role = get_role(data["role"])
-            if not role:
-                abort(400, f'Invalid role: {data["role"]}')
-            current_user.assign_role(role)
-            del data["role"]
-
-    if "roles" in data:
-        for role_name in data["roles"]:
-            role = get_role(role_name)
-            if not role:
-                abort(400, f"Invalid role: {role_name}")
-            if role in current_user.roles:
-                continue
-            current_user.assign_role(role)
-        del data["roles"]
-
-    if "remove_role" in data:
-        role = (
-            db.session.query(Role).filter_by(name=data["remove_role"].lower()).first()
-        )
-        if role:
-            current_user.remove_role(role)
-        else:
-            abort(400, f'Invalid role: {data["remove_role"]}')
-        del data["remove_role"]
+    with storage.unit_of_work():
+        if "role" in data:
+            user_has_role = current_user.get_role(data["role"].lower())
+            if user_has_role:
+                del data["role"]
+            else:
+                role = get_role(data["role"])
+                if not role:
+                    abort(400, f'Invalid role: {data["role"]}')
+                current_user.assign_role(role)
+                del data["role"]
+
+        if "roles" in data:
+            for role_name in data["roles"]:
+                role = get_role(role_name)
+                if not role:
+                    abort(400, f"Invalid role: {role_name}")
+                if role in current_user.roles:
+                    continue
+                current_user.assign_role(role)
+            del data["roles"]
+
+        if "remove_role" in data:
+            role = (
+                db.session.query(Role)
+                .filter_by(name=data["remove_role"].lower())
+                .first()
+            )
+            if role:
+                current_user.remove_role(role)
+            else:
+                abort(400, f'Invalid role: {data["remove_role"]}')
+            del data["remove_role"]
 
-    current_user.update(**data)
+        current_user.update(**data)
     return jsonify(current_user.to_dict()), 201
 
 
 # delete a user
 @api_bp.route("/users/<string:user_id>", methods=["DELETE"], strict_slashes=False)
 @admin_required
-@jwt_required()
+@token_required()
 def delete_user(user_id):
     """Delete a user."""
     user = db.session.get(User, user_id)
@@ -244,16 +227,37 @@ def delete_user(user_id):
     return jsonify({}), 204
 
 
+# revoke every token issued to a user or patient, e.g. a lost phone
+@api_bp.route(
+    "/users/<string:user_id>/revoke-tokens", methods=["POST"], strict_slashes=False
+)
+@admin_required
+@token_required()
+def revoke_user_tokens(user_id):
+    """Revoke all of a user's or patient's access and refresh tokens."""
+    person = db.session.get(Person, user_id)
+    if not person:
+        abort(404, "User not found")
+    person.revoke_tokens()
+    db.session.commit()
+    return jsonify({"message": "User's tokens revoked"}), 200
+
+
 # get a user by id
 @api_bp.route("/users/<string:user_id>", methods=["GET"], strict_slashes=False)
 @admin_required
-@jwt_required()
+@token_required()
 def get_user(user_id):
     """Return a user."""
-    user = db.session.get(User, user_id)
+    fields = requested_fields()
+    user = (
+        load_fields(db.session.query(User), User, fields)
+        .filter(User.id == user_id)
+        .first()
+    )
     if not user:
         abort(404, "User not found")
-    return jsonify(user.to_dict()), 200
+    return jsonify(user.to_dict(fields)), 200
 
 
 # get a user by phone_no
@@ -261,10 +265,15 @@ def get_user(user_id):
     "/users/phone_no/<string:phone_no>", methods=["GET"], strict_slashes=False
 )
 @admin_required
-@jwt_required()
+@token_required()
 def get_user_by_phone_no(phone_no):
     """Return a user."""
-    user = db.session.query(User).filter_by(phone_no=phone_no).first()
+    fields = requested_fields()
+    user = (
+        load_fields(db.session.query(User), User, fields)
+        .filter_by(phone_no=phone_no)
+        .first()
+    )
     if not user:
         abort(404, "User not found")
-    return jsonify(user.to_dict()), 200
+    return jsonify(user.to_dict(fields)), 200
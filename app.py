@@ -1,16 +1,18 @@
 #!/usr/bin/env python3
 """Main entry point for the application."""
 
+import click
 from flask import Flask
-from flask_jwt_extended import JWTManager
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import logging
 import config.config as config
+from auth.token_cache import CachingJWTManager
 
 db = SQLAlchemy()
-jwt_manager = JWTManager()
+jwt_manager = CachingJWTManager()
 login_manager = LoginManager()  # TODO wont need this if using JWT
 
 
@@ -38,9 +40,16 @@ def create_app(*args, **kwargs):
     config_class = config.configurations.get(env, config.configurations["default"])
     app.config.from_object(config_class)
 
+    # Trust X-Forwarded-For from the proxies in front of the app (e.g. Heroku's router)
+    if app.config.get("TRUSTED_PROXY_COUNT"):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXY_COUNT"])
+
     # Initialize extensions
     # Database
     try:
+        from storage.pool import pool_metrics
+
+        pool_metrics.init_app(app)
         db.init_app(app)
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}")
@@ -53,6 +62,33 @@ def create_app(*args, **kwargs):
         logging.error(f"Failed to initialize JWT: {e}")
         raise
 
+    # Password hashing
+    try:
+        from auth.hashing import password_hasher
+
+        password_hasher.init_app(app)
+    except Exception as e:
+        logging.error(f"Failed to initialize password hasher: {e}")
+        raise
+
+    # Rate limiting of the authentication endpoints
+    try:
+        from auth.rate_limit import rate_limiter
+
+        rate_limiter.init_app(app)
+    except Exception as e:
+        logging.error(f"Failed to initialize rate limiter: {e}")
+        raise
+
+    # Text messages carrying one-time codes
+    try:
+        from auth.sms import sms_sender
+
+        sms_sender.init_app(app)
+    except Exception as e:
+        logging.error(f"Failed to initialize SMS sender: {e}")
+        raise
+
     # Login Manager
     try:
         login_manager.init_app(app)  # TODO wont need this if using JWT
@@ -64,6 +100,7 @@ def create_app(*args, **kwargs):
     with app.app_context():
         try:
             from auth.blocklist import TokenBlockList
+            from auth.otp import OneTimeCode
             from models.person import Person
             from models.user import User
             from models.role import Role
@@ -85,6 +122,45 @@ def create_app(*args, **kwargs):
             logging.error(f"Failed to create database tables: {e}")
             raise
 
+        # Bring tables created by older releases up to date
+        try:
+            from storage.schema import (
+                create_missing_indexes,
+                report_missing_indexes,
+                upgrade_schema,
+            )
+
+            def create_indexes():
+                # duplicates from older releases would fail the unique index
+                TokenBlockList.remove_duplicates()
+                return create_missing_indexes(db)
+
+            upgrade_schema(db)
+            if app.config.get("SCHEMA_CREATE_INDEXES", False):
+                create_indexes()
+            report_missing_indexes(db)
+        except Exception as e:
+            logging.error(f"Failed to upgrade database schema: {e}")
+            raise
+
+        # Report the connection pool on the admin endpoint
+        try:
+            pool_metrics.watch(
+                "primary", db.engine, app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+            )
+        except Exception as e:
+            logging.error(f"Failed to instrument connection pool: {e}")
+            raise
+
+        # Start with empty row counts for this database
+        try:
+            from storage.counts import row_counts
+
+            row_counts.init_app(app)
+        except Exception as e:
+            logging.error(f"Failed to initialize row counts: {e}")
+            raise
+
         # Register blueprints
         try:
             from api.v1.views import api_bp
@@ -96,18 +172,75 @@ def create_app(*args, **kwargs):
             logging.error(f"Failed to register blueprint: {e}")
             raise
 
+        # Verify the bearer token once per request
+        try:
+            from auth.identity import load_identity
+
+            app.before_request(load_identity)
+        except Exception as e:
+            logging.error(f"Failed to register identity loader: {e}")
+            raise
+
+        # Send the reads of GET requests to the read replicas, if any
+        try:
+            from storage.replicas import replica_router
+
+            replica_router.init_app(app)
+        except Exception as e:
+            logging.error(f"Failed to initialize read replicas: {e}")
+            raise
+
+        # Count the SQL statements run by each request
+        try:
+            from storage.profiling import query_profiler
+
+            query_profiler.init_app(app)
+        except Exception as e:
+            logging.error(f"Failed to initialize query profiler: {e}")
+            raise
+
+        # Let concurrent workers share the SQLite fallback database
+        try:
+            from storage.sqlite import sqlite_guard
+
+            sqlite_guard.init_app(app)
+        except Exception as e:
+            logging.error(f"Failed to configure SQLite: {e}")
+            raise
+
         # Register jwt token_in_blocklist_loader
         try:
+            from auth.blocklist import blocklist_cache
+            from auth.claims import claim_versions, is_token_outdated
+
+            blocklist_cache.init_app(app)
+            claim_versions.init_app(app)
+
 
             @jwt_manager.token_in_blocklist_loader
             def check_if_token_in_blocklist(jwt_header, decrypted_token):
                 jti = decrypted_token["jti"]
-                return TokenBlockList.is_jti_blocklisted(jti)
+                return TokenBlockList.is_jti_blocklisted(jti) or is_token_outdated(
+                    decrypted_token
+                )
 
         except Exception as e:
             logging.error(f"Failed to load jwt token_in_blocklist_loader: {e}")
             raise
 
+        # Register cli commands
+        @app.cli.command("clean-block-list")
+        def clean_block_list():
+            """Delete block list entries whose token has expired."""
+            deleted = TokenBlockList.clean_block_list()
+            click.echo(f"Deleted {deleted} expired block list entries.")
+
+        @app.cli.command("create-indexes")
+        def create_indexes_command():
+            """Create the model indexes missing from the database."""
+            created = create_indexes()
+            click.echo(f"Created {len(created)} missing indexes.")
+
         # Register error handlers
         # try:
         ##    from api.v1.views.error_handlers import register_error_handlers
@@ -1,11 +1,16 @@
 """Authentication blueprint."""
 
-from flask import abort, jsonify, request
-from flask_jwt_extended import decode_token, get_jwt, get_jwt_identity, jwt_required
+from flask import abort, current_app, jsonify, request
+from flask_jwt_extended import decode_token
 from api.v1.views.index import status
+from api.v1.views.error_handlers import too_many_requests
 
 from auth import auth_bp
 from auth.blocklist import TokenBlockList
+from auth.identity import current_identity, token_required
+from auth.otp import OneTimeCode
+from auth.rate_limit import rate_limited
+from auth.sms import sms_sender
 from auth.validators import is_valid_kenyan_phone, is_valid_password
 
 from app import db
@@ -13,16 +18,18 @@ from models.patient import Patient
 from models.person import Person
 from models.user import User
 
+auth_bp.register_error_handler(429, too_many_requests)
+
 
 # api refresh token
 @auth_bp.route("/api/v1/refresh", methods=["GET", "POST"], strict_slashes=False)
-@jwt_required(refresh=True)
+@token_required(refresh=True)
 def refresh():
     """Refresh token."""
-    current_user_id = get_jwt_identity()
+    current_user = current_identity.person
     new_token = None
-    if current_user_id:
-        new_token = db.session.get(Person, current_user_id).generate_access_token()
+    if current_user:
+        new_token = current_user.generate_access_token()
     return jsonify(access_token=new_token), 200
 
 
@@ -51,6 +58,7 @@ def login():
 
 # post login
 @auth_bp.route("/api/v1/login", methods=["POST"], strict_slashes=False)
+@rate_limited
 def login_post():
     data = request.get_json()
 
@@ -96,24 +104,19 @@ def validate_phone_passwd(data) -> tuple:
 
 def get_user_or_patient(phone_no) -> tuple:
     """Get user or patient instance."""
-    person = Person.query.filter_by(phone_no=phone_no).first()
+    user_or_patient_instance = Person.find_by_phone_no(phone_no)
 
-    if not person:
+    if not user_or_patient_instance:
         return False, jsonify({"message": "User not found"})
 
-    user_or_patient_instance = None
-
-    if person.type == "user":
-        user_or_patient_instance = User.query.filter_by(phone_no=phone_no).first()
-    elif person.type == "patient":
-        user_or_patient_instance = Patient.query.filter_by(phone_no=phone_no).first()
-
     return True, user_or_patient_instance
 
 
 def authenticate_user(user_or_patient_instance, password) -> tuple:
     """User authentication helper function."""
     if user_or_patient_instance and user_or_patient_instance.check_password(password):
+        if user_or_patient_instance.rehash_password(password):
+            db.session.commit()
         access_token = user_or_patient_instance.generate_access_token()
         refresh_token = user_or_patient_instance.generate_refresh_token()
         return (
@@ -132,26 +135,32 @@ def authenticate_user(user_or_patient_instance, password) -> tuple:
 
 
 @auth_bp.route("/api/v1/logout", methods=["POST"])
-@jwt_required()
+@token_required()
 def logout():
-    access_jti = get_jwt()["jti"]
-    db.session.add(TokenBlockList(jti=access_jti))
-
     refresh_token = request.json.get("refresh_token", None)
-    if refresh_token:
-        refresh_jti = decode_token(refresh_token)["jti"]
-        db.session.add(TokenBlockList(jti=refresh_jti))
-    else:
+    if not refresh_token:
         abort(400, description="Refresh token is missing")
 
-    db.session.commit()
+    TokenBlockList.revoke(current_identity.claims, decode_token(refresh_token))
     return jsonify({"message": "Logged out successfully"}), 200
 
 
+# log out of every session, e.g. after losing a phone
+@auth_bp.route("/api/v1/logout-all", methods=["POST"], strict_slashes=False)
+@token_required()
+def logout_all():
+    current_user = current_identity.person
+    if current_user is None:
+        abort(401, description="Authentication is required to access this resource")
+
+    current_user.revoke_tokens()
+    db.session.commit()
+    return jsonify({"message": "Logged out of all sessions successfully"}), 200
+
+
 # api forgot password
 @auth_bp.route("/api/v1/forgot-password", methods=["GET"], strict_slashes=False)
 def forgot_password():
-    # TODO implement service to send code to their phone number to use in reseting password
     return (
         jsonify(
             {
@@ -163,8 +172,9 @@ def forgot_password():
     )
 
 
-# incomplete, need a sms service to send code to their phone number to use in reseting password
+# send a code to the phone number to use in reseting password
 @auth_bp.route("/api/v1/forgot-password", methods=["POST"], strict_slashes=False)
+@rate_limited
 def forgot_password_post():
     data = request.get_json()
     phone_no = data.get("phone_no")
@@ -177,7 +187,11 @@ def forgot_password_post():
     if not person:
         return jsonify({"message": "User not found"}), 404
 
-    # TODO implement service to send code to their phone number to use in reseting password
+    code = OneTimeCode.issue(phone_no)
+    minutes = current_app.config.get("OTP_TTL_SECONDS", 600) // 60
+    sms_sender.send(
+        phone_no, f"Your DigiMCH password reset code is {code}. It expires in {minutes} minutes."
+    )
     return (
         jsonify(
             {
@@ -191,6 +205,7 @@ def forgot_password_post():
 
 # api reset password
 @auth_bp.route("/api/v1/reset-password", methods=["POST"], strict_slashes=False)
+@rate_limited
 def reset_password():
     """Reset password.
     Requires: (phone_no, code, password, confirm_password)
@@ -220,20 +235,14 @@ def reset_password():
     if not phone_no or not is_valid_kenyan_phone(phone_no):
         return jsonify({"message": "Please provide a valid Kenyan phone number"}), 400
 
-    user_or_patient_instance = None
-    person = Person.query.filter_by(phone_no=phone_no).first()
+    person = Person.find_by_phone_no(phone_no)
     if not person:
         return jsonify({"message": "User not found"}), 404
 
-    if person.type == "user":
-        user_or_patient_instance = User.query.filter_by(phone_no=phone_no).first()
-    elif person.type == "patient":
-        user_or_patient_instance = Patient.query.filter_by(phone_no=phone_no).first()
-
-    new_password_hash = person.set_password(password)
+    if not OneTimeCode.verify(phone_no, code):
+        return jsonify({"message": "Invalid or expired code"}), 400
 
-    if user_or_patient_instance:
-        user_or_patient_instance.password_hash = new_password_hash
+    person.set_password(password)
     db.session.commit()
 
     return jsonify({"message": "Password reset successfully"}), 200
@@ -243,7 +252,7 @@ def reset_password():
 
 # api change phone number- requires an admin to approve the change
 @auth_bp.route("/api/v1/change-phone-number", methods=["POST"], strict_slashes=False)
-@jwt_required()
+@token_required()
 def change_phone_number():
     """Change phone number.
     Requires: (phone_no, password)
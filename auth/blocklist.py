@@ -1,8 +1,13 @@
 """Define a block list model."""
 
-from datetime import datetime
-from flask_jwt_extended import decode_token
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+from flask import current_app
 from app import db
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import func
 
 
@@ -12,14 +17,17 @@ class TokenBlockList(db.Model):
     __tablename__ = "block_list"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    jti = db.Column(db.String(128), nullable=False)
+    jti = db.Column(db.String(128), nullable=False, unique=True, index=True)
+    # unix timestamp copied from the token's exp claim
+    expires_at = db.Column(db.Integer, nullable=True, index=True)
     created_at = db.Column(
         db.DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
-    def __init__(self, jti):
+    def __init__(self, jti, expires_at=None):
         """Initialize a block list model."""
         self.jti = jti
+        self.expires_at = expires_at
 
     def __repr__(self):
         """Represent a block list model by its id."""
@@ -32,17 +40,175 @@ class TokenBlockList(db.Model):
 
     @staticmethod
     def is_jti_blocklisted(jti):
-        """Check if a token is blocklisted."""
-        query = TokenBlockList.query.filter_by(jti=jti).first()
-        return bool(query)
+        """Check if a token is blocklisted.
+
+        Answered from the worker-local cache, so a token that has not been
+        revoked costs no database round trip.
+        """
+        return blocklist_cache.contains(jti)
+
+    @staticmethod
+    def revoke(*tokens):
+        """Blocklist one or more decoded tokens in a single commit.
+
+        Each token is its claims dict; the jti and exp claims are stored.
+        Tokens that are already blocklisted are skipped, so revoking the same
+        refresh token twice does not trip the unique index on jti.
+        """
+        expiries = {token["jti"]: token.get("exp") for token in tokens if token}
+        if not expiries:
+            return
+        existing = {
+            row.jti
+            for row in db.session.query(TokenBlockList.jti).filter(
+                TokenBlockList.jti.in_(expiries)
+            )
+        }
+        for jti, expires_at in expiries.items():
+            if jti not in existing:
+                db.session.add(TokenBlockList(jti=jti, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another request revoked one of them since; add the rest
+            db.session.rollback()
+            existing = {
+                row.jti
+                for row in db.session.query(TokenBlockList.jti).filter(
+                    TokenBlockList.jti.in_(expiries)
+                )
+            }
+            for jti, expires_at in expiries.items():
+                if jti not in existing:
+                    db.session.add(TokenBlockList(jti=jti, expires_at=expires_at))
+            db.session.commit()
+        blocklist_cache.add(*expiries)
 
     @staticmethod
-    def clean_block_list():
-        """Delete all block list entries."""
-        now = datetime.now()
-        blocklisted_tokens = TokenBlockList.query.all()
-        for token in blocklisted_tokens:
-            metadata = decode_token(token.jti)
-            if metadata["exp"] < now:
-                db.session.delete(token)
+    def remove_duplicates():
+        """Delete all but the first row of each jti.
+
+        Releases before the unique index on jti could blocklist a token
+        twice; the duplicates must go before that index can be built.
+        Returns the number of rows deleted.
+        """
+        first_rows = (
+            db.session.query(func.min(TokenBlockList.id))
+            .group_by(TokenBlockList.jti)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            delete(TokenBlockList).where(TokenBlockList.id.not_in(first_rows))
+        )
         db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def clean_block_list(now=None):
+        """Delete block list entries whose token has expired.
+
+        An expired token is rejected before the block list is consulted, so
+        its row is dead weight. Rows written before expiries were recorded
+        are dropped once they are older than the longest refresh token
+        lifetime. Returns the number of rows deleted.
+        """
+        if now is None:
+            now = time.time()
+        refresh_lifetime = current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+        legacy_cutoff = datetime.fromtimestamp(now, timezone.utc).replace(
+            tzinfo=None
+        ) - timedelta(seconds=refresh_lifetime)
+        result = db.session.execute(
+            delete(TokenBlockList).where(
+                or_(
+                    TokenBlockList.expires_at < int(now),
+                    and_(
+                        TokenBlockList.expires_at.is_(None),
+                        TokenBlockList.created_at < legacy_cutoff,
+                    ),
+                )
+            )
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+class BlocklistCache:
+    """Worker-local mirror of the blocklisted token ids.
+
+    Every gunicorn worker keeps its own copy. Rows added since the last
+    refresh are pulled in by id at most once every
+    ``JWT_BLOCKLIST_REFRESH_SECONDS``, and the whole set is rebuilt every
+    ``JWT_BLOCKLIST_RESYNC_SECONDS`` to pick up anything an incremental
+    refresh could have missed. Revocations made by this worker are visible
+    immediately; revocations made by other workers become visible within
+    one refresh interval.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self.refresh_interval = 5
+        self.resync_interval = 300
+        self.reset()
+
+    def init_app(self, app):
+        """Read the refresh settings from the app config and start empty."""
+        self.refresh_interval = app.config.get("JWT_BLOCKLIST_REFRESH_SECONDS", 5)
+        self.resync_interval = app.config.get("JWT_BLOCKLIST_RESYNC_SECONDS", 300)
+        self.reset()
+
+    def reset(self):
+        """Forget everything, forcing a full load on the next lookup."""
+        with self._lock:
+            self._jtis = set()
+            self._last_id = 0
+            self._refreshed_at = None
+            self._resynced_at = None
+
+    def add(self, *jtis):
+        """Record token ids revoked by this worker."""
+        with self._lock:
+            self._jtis.update(jtis)
+
+    def contains(self, jti):
+        """Return True if the token id is blocklisted."""
+        now = time.monotonic()
+        if self._resynced_at is None or now - self._resynced_at >= self.resync_interval:
+            self._load(full=True)
+        elif now - self._refreshed_at >= self.refresh_interval:
+            self._load(full=False)
+        return jti in self._jtis
+
+    def _load(self, full):
+        """Pull blocklisted ids from the database.
+
+        A full load replaces the set and leaves out tokens that have since
+        expired; an incremental one only reads rows newer than the last id
+        seen, which is a primary key range scan.
+        """
+        query = db.session.query(TokenBlockList.id, TokenBlockList.jti)
+        if full:
+            query = query.filter(
+                or_(
+                    TokenBlockList.expires_at.is_(None),
+                    TokenBlockList.expires_at >= int(time.time()),
+                )
+            )
+        else:
+            query = query.filter(TokenBlockList.id > self._last_id)
+        rows = query.order_by(TokenBlockList.id).all()
+        now = time.monotonic()
+        with self._lock:
+            if full:
+                self._jtis = {row.jti for row in rows}
+                self._last_id = 0
+                self._resynced_at = now
+            else:
+                self._jtis.update(row.jti for row in rows)
+            if rows:
+                self._last_id = max(self._last_id, rows[-1].id)
+            self._refreshed_at = now
+
+
+blocklist_cache = BlocklistCache()
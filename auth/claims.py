@@ -0,0 +1,156 @@
+"""Authorization claims carried in access tokens."""
+
+from collections import OrderedDict
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from storage.replicas import reads_from_primary
+
+ROLES_CLAIM = "roles"
+ROLE_VERSION_CLAIM = "rv"
+GENERATION_CLAIM = "gen"
+
+
+class ClaimVersionCache:
+    """Worker-local cache of the version counters stored on each person.
+
+    Tokens carry the counters that were current when they were issued; a
+    token whose counters still match can be trusted without loading the
+    person. Entries live for ``CLAIM_VERSION_CACHE_SECONDS``, so a change
+    made through another worker is picked up within that window, and the
+    least recently used entries are dropped past ``CLAIM_VERSION_CACHE_SIZE``.
+    """
+
+    columns = ("role_version", "token_generation")
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self.ttl = 30
+        self.max_size = 10000
+        self.reset()
+
+    def init_app(self, app):
+        """Read the cache settings from the app config and start empty."""
+        self.ttl = app.config.get("CLAIM_VERSION_CACHE_SECONDS", 30)
+        self.max_size = app.config.get("CLAIM_VERSION_CACHE_SIZE", 10000)
+        self.reset()
+
+    def reset(self):
+        """Forget every cached person."""
+        with self._lock:
+            self._entries = OrderedDict()
+
+    def invalidate(self, person_id):
+        """Drop a person so the next lookup reads the database."""
+        with self._lock:
+            self._entries.pop(person_id, None)
+
+    def invalidate_on_commit(self, person_id):
+        """Drop a person now and again once the pending change is committed.
+
+        The second drop stops a lookup made before the commit from keeping
+        the old counters cached.
+        """
+        self.invalidate(person_id)
+        db.session.info.setdefault("stale_claim_versions", set()).add(person_id)
+
+    def get(self, person_id):
+        """Return a person's current counters, or None if they do not exist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(person_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(person_id)
+                return entry[0]
+
+        from models.person import Person
+
+        with reads_from_primary():
+            row = (
+                db.session.query(*(getattr(Person, name) for name in self.columns))
+                .filter(Person.id == person_id)
+                .first()
+            )
+        if row is None:
+            self.invalidate(person_id)
+            return None
+        versions = {name: value or 0 for name, value in zip(self.columns, row)}
+        with self._lock:
+            self._entries[person_id] = (versions, now)
+            self._entries.move_to_end(person_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return versions
+
+
+claim_versions = ClaimVersionCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    """Drop the people whose counters were changed by the committed transaction."""
+    for person_id in session.info.pop("stale_claim_versions", ()):
+        claim_versions.invalidate(person_id)
+
+
+def role_claims(person) -> dict:
+    """Return the role claims to embed in a person's access token."""
+    return {
+        ROLES_CLAIM: [role.name for role in person.roles],
+        ROLE_VERSION_CLAIM: person.role_version or 0,
+    }
+
+
+def generation_claims(person) -> dict:
+    """Return the token generation claim to embed in a person's tokens."""
+    return {GENERATION_CLAIM: person.token_generation or 0}
+
+
+def is_token_outdated(claims) -> bool:
+    """Return True if a token was issued before its holder's tokens were revoked.
+
+    Tokens of people who no longer exist are outdated as well.
+    """
+    person_id = claims.get("sub")
+    if person_id is None:
+        return False
+    versions = claim_versions.get(person_id)
+    if versions is None:
+        return True
+    return claims.get(GENERATION_CLAIM, 0) < versions["token_generation"]
+
+
+def token_roles(claims):
+    """Return the role names held by the bearer of a verified token.
+
+    The roles embedded in the token are used while its role version is
+    still current. Tokens issued before a role change, or before roles were
+    embedded at all, fall back to loading the person's roles.
+
+    Returns:
+        list: The role names, or None if the person no longer exists.
+    """
+    person_id = claims.get("sub")
+    if person_id is None:
+        return None
+    versions = claim_versions.get(person_id)
+    if versions is None:
+        return None
+    if (
+        ROLES_CLAIM in claims
+        and claims.get(ROLE_VERSION_CLAIM) == versions["role_version"]
+    ):
+        return claims[ROLES_CLAIM]
+
+    from models.person import Person
+
+    with reads_from_primary():
+        person = db.session.get(Person, person_id)
+        if person is None:
+            return None
+        return [role.name for role in person.roles]
@@ -0,0 +1,113 @@
+"""Password hashing service."""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+
+def canonical_method(method) -> str:
+    """Return a werkzeug method string with its default parameters filled in.
+
+    werkzeug accepts ``scrypt`` for ``scrypt:32768:8:1`` and ``pbkdf2`` for
+    ``pbkdf2:sha256:<default iterations>``, but always writes the full form
+    at the start of the hashes it makes.
+
+    Args:
+        method (str): A method string, e.g. from ``PASSWORD_HASH_METHOD`` or
+            the part of a hash before the first ``$``.
+
+    Returns:
+        str: The method with every parameter given.
+    """
+    name, *args = method.split(":")
+    if name == "scrypt":
+        defaults = [str(2**15), "8", "1"]
+    elif name == "pbkdf2":
+        defaults = ["sha256", str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    args += defaults[len(args):]
+    return ":".join([name, *args])
+
+
+class PasswordHasher:
+    """Hash and verify passwords with a configurable method and cost.
+
+    ``PASSWORD_HASH_METHOD`` is a werkzeug method string including its cost
+    parameters, e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashes
+    made with any other method still verify, and ``needs_rehash`` reports
+    them so they can be upgraded on the next successful login.
+
+    With ``PASSWORD_HASH_WORKERS`` above zero, hashing runs in a process
+    pool of that size instead of on the request thread, so the number of
+    concurrent hashes is bounded independently of the web workers. The pool
+    is created lazily in each process, after gunicorn has forked.
+
+    The request thread still blocks until its hash is done, so the pool only
+    pays off with threaded workers (``WEB_THREADS`` above 1): other threads
+    keep serving requests while a few hashes run. A single-threaded worker
+    gains nothing but the cost of sending each hash to another process,
+    which is why the pool is off by default.
+    """
+
+    def __init__(self):
+        """Initialize a hasher that hashes on the calling thread."""
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self.method = "scrypt:32768:8:1"
+        self.workers = 0
+        self.timeout = 30
+
+    def init_app(self, app):
+        """Read the hashing settings from the app config."""
+        self.shutdown()
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", 0)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", 30)
+
+    def hash(self, password) -> str:
+        """Return a hash of the password using the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password) -> bool:
+        """Return True if the password matches the hash."""
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash) -> bool:
+        """Return True if the hash was made with another method or cost."""
+        method = password_hash.split("$", 1)[0]
+        return canonical_method(method) != canonical_method(self.method)
+
+    def shutdown(self):
+        """Stop this process's pool, if one was started."""
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
+            self._pool_pid = None
+
+    def _run(self, fn, *args):
+        """Call fn in the pool if one is configured, else inline."""
+        if not self.workers:
+            return fn(*args)
+        return self._get_pool().submit(fn, *args).result(timeout=self.timeout)
+
+    def _get_pool(self):
+        """Return this process's pool, starting it on first use."""
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+
+password_hasher = PasswordHasher()
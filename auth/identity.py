@@ -0,0 +1,125 @@
+"""Request-scoped identity of the caller.
+
+The bearer token is verified once per request by ``load_identity``, which is
+registered as a ``before_request`` hook. Decorators and views then read the
+verified claims and the current person from ``current_identity`` instead of
+decoding the token again.
+"""
+
+from functools import wraps
+
+from flask import g
+from flask_jwt_extended import verify_jwt_in_request
+from flask_jwt_extended.exceptions import (
+    JWTExtendedException,
+    NoAuthorizationError,
+    WrongTokenError,
+)
+from jwt.exceptions import PyJWTError
+from werkzeug.local import LocalProxy
+
+from app import db
+from auth.claims import token_roles
+from storage.replicas import reads_from_primary
+
+_unset = object()
+
+
+class RequestIdentity:
+    """The verified token of the current request and who it belongs to.
+
+    Attributes:
+        claims (dict): The verified claims, empty if no token was sent.
+        error (Exception): Why the token was rejected, if it was.
+    """
+
+    def __init__(self, claims=None, error=None):
+        """Initialize an identity from verified claims or a rejection."""
+        self.claims = claims or {}
+        self.error = error
+        self._roles = _unset
+        self._person = _unset
+
+    @property
+    def id(self):
+        """The id of the person the token was issued to."""
+        return self.claims.get("sub")
+
+    @property
+    def is_authenticated(self) -> bool:
+        """Whether the request carried a valid token."""
+        return bool(self.claims)
+
+    @property
+    def roles(self):
+        """The caller's role names, or None if they no longer exist."""
+        if self._roles is _unset:
+            self._roles = token_roles(self.claims) if self.claims else None
+        return self._roles
+
+    @property
+    def person(self):
+        """The current person, loaded from the primary on first access."""
+        if self._person is _unset:
+            from models.person import Person
+
+            with reads_from_primary():
+                self._person = db.session.get(Person, self.id) if self.id else None
+        return self._person
+
+    def require(self, refresh=False):
+        """Raise the error ``jwt_required`` would have raised, if any.
+
+        The exceptions are the ones flask_jwt_extended raises itself, so its
+        error handlers produce the usual responses.
+        """
+        if self.error is not None:
+            raise self.error
+        if not self.is_authenticated:
+            raise NoAuthorizationError("Missing Authorization Header")
+        if refresh and self.claims.get("type") != "refresh":
+            raise WrongTokenError("Only refresh tokens are allowed")
+        if not refresh and self.claims.get("type") == "refresh":
+            raise WrongTokenError("Only non-refresh tokens are allowed")
+
+
+def load_identity():
+    """Verify the request's token, if any, and store the identity on ``g``.
+
+    Invalid tokens are not rejected here, so public endpoints keep working;
+    the error is raised by whichever decorator requires a token.
+    """
+    try:
+        verified = verify_jwt_in_request(optional=True, verify_type=False)
+    except (JWTExtendedException, PyJWTError) as error:
+        g.identity = RequestIdentity(error=error)
+    else:
+        g.identity = RequestIdentity(claims=verified[1] if verified else None)
+
+
+def _get_identity():
+    """Return the identity of the current request."""
+    if "identity" not in g:
+        load_identity()
+    return g.identity
+
+
+current_identity = LocalProxy(_get_identity)
+
+
+def token_required(refresh=False):
+    """Protect a view with the token verified for this request.
+
+    Args:
+        refresh (bool): Require a refresh token instead of an access token.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            current_identity.require(refresh=refresh)
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
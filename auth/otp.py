@@ -0,0 +1,114 @@
+"""One-time codes for confirming a phone number, e.g. to reset a password."""
+
+import hashlib
+import hmac
+import secrets
+import time
+
+from flask import current_app
+from app import db
+from storage import storage
+from sqlalchemy import delete
+from sqlalchemy.sql import func
+
+
+class OneTimeCode(db.Model):
+    """Define the one-time code currently issued to a phone number.
+
+    Only an HMAC of the code is stored. Each phone number has at most one
+    live code, found through the unique index on phone_no, and expired rows
+    are purged with a range delete on the expires_at index.
+    """
+
+    __tablename__ = "one_time_codes"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    phone_no = db.Column(db.String(20), nullable=False, unique=True, index=True)
+    code_hash = db.Column(db.String(64), nullable=False)
+    # unix timestamp after which the code is no longer accepted
+    expires_at = db.Column(db.Integer, nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    created_at = db.Column(
+        db.DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self):
+        """Represent a one-time code by its phone number."""
+        return f"<OneTimeCode {self.phone_no}>"
+
+    @staticmethod
+    def hash_code(phone_no, code) -> str:
+        """Return the HMAC of a code, keyed by the app secret and phone number."""
+        key = current_app.config["SECRET_KEY"].encode()
+        message = f"{phone_no}:{code}".encode()
+        return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def issue(phone_no, now=None) -> str:
+        """Issue a new code for a phone number, replacing any earlier one.
+
+        Returns:
+            str: The code, to be sent to the phone number. It is not stored.
+        """
+        if now is None:
+            now = time.time()
+        OneTimeCode.purge_expired(now=now, commit=False)
+        length = current_app.config.get("OTP_LENGTH", 6)
+        code = f"{secrets.randbelow(10 ** length):0{length}d}"
+        row = {
+            "phone_no": phone_no,
+            "code_hash": OneTimeCode.hash_code(phone_no, code),
+            "expires_at": int(now) + current_app.config.get("OTP_TTL_SECONDS", 600),
+            "attempts": 0,
+        }
+        # an upsert, so two requests racing for a new phone number do not
+        # both insert and trip the unique index on phone_no
+        storage.bulk_upsert(
+            OneTimeCode,
+            [row],
+            ["phone_no"],
+            update_columns=["code_hash", "expires_at", "attempts"],
+        )
+        db.session.commit()
+        return code
+
+    @staticmethod
+    def verify(phone_no, code, now=None) -> bool:
+        """Check a code for a phone number, using it up if it matches.
+
+        Every wrong guess counts against ``OTP_MAX_ATTEMPTS``; once they are
+        used up the code is rejected even if it is right.
+        """
+        if now is None:
+            now = time.time()
+        otp = OneTimeCode.query.filter_by(phone_no=phone_no).first()
+        if otp is None:
+            return False
+        if otp.expires_at <= now:
+            db.session.delete(otp)
+            db.session.commit()
+            return False
+        max_attempts = current_app.config.get("OTP_MAX_ATTEMPTS", 5)
+        if otp.attempts >= max_attempts:
+            return False
+        if not hmac.compare_digest(
+            otp.code_hash, OneTimeCode.hash_code(phone_no, str(code))
+        ):
+            otp.attempts += 1
+            db.session.commit()
+            return False
+        db.session.delete(otp)
+        db.session.commit()
+        return True
+
+    @staticmethod
+    def purge_expired(now=None, commit=True) -> int:
+        """Delete expired codes. Returns the number of rows deleted."""
+        if now is None:
+            now = time.time()
+        result = db.session.execute(
+            delete(OneTimeCode).where(OneTimeCode.expires_at <= int(now))
+        )
+        if commit:
+            db.session.commit()
+        return result.rowcount
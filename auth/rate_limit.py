@@ -0,0 +1,207 @@
+"""Token-bucket rate limiting for the authentication endpoints.
+
+Every request spends one token from a bucket per client IP and, when the
+body carries one, a bucket per phone number. Buckets refill continuously at
+the configured rate, so short bursts are allowed while sustained guessing is
+rejected with a 429 before any password work is done.
+
+Buckets live in the store named by ``RATELIMIT_STORAGE_URI``:
+
+- ``memory://`` keeps them in the worker process (one set per worker);
+- ``sqlite:///path/to/file.db`` keeps them in a SQLite file, shared by all
+  workers on the host.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 60 * 60 * 24}
+
+
+def parse_limit(limit) -> tuple:
+    """Parse a limit such as ``5/minute`` into (capacity, tokens per second)."""
+    match = re.match(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$", limit)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {limit}")
+    capacity = int(match.group(1))
+    return capacity, capacity / PERIODS[match.group(2)]
+
+
+def take_token(tokens, updated, capacity, rate, now) -> tuple:
+    """Refill a bucket up to now and try to spend one token from it.
+
+    Returns:
+        tuple: (tokens left, whether a token was spent, seconds to wait).
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0
+    return tokens, False, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets held in this process.
+
+    Buckets are kept in the order they were last used. Once ``max_keys``
+    are held, the least recently used one is dropped for each new key; it
+    has had the longest to refill, so dropping it forgives the least.
+    """
+
+    max_keys = 100000
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, capacity, rate, now) -> tuple:
+        """Spend a token from a bucket; see ``take_token``."""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (None, None))
+            while len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            tokens, allowed, retry_after = take_token(
+                tokens, updated, capacity, rate, now
+            )
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class SqliteBucketStore:
+    """Buckets held in a SQLite file shared by the workers on a host."""
+
+    prune_every = 1000
+    prune_after = 60 * 60 * 24
+
+    def __init__(self, path):
+        """Initialize a store backed by the SQLite file at path."""
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use."""
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_buckets_updated ON buckets (updated)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def take(self, key, capacity, rate, now) -> tuple:
+        """Spend a token from a bucket; see ``take_token``."""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, allowed, retry_after = take_token(
+                *(row or (None, None)), capacity, rate, now
+            )
+            connection.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                connection.execute(
+                    "DELETE FROM buckets WHERE updated < ?", (now - self.prune_after,)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+def bucket_store(uri):
+    """Return the bucket store for a ``RATELIMIT_STORAGE_URI``."""
+    if uri.startswith("sqlite:///"):
+        path = uri[len("sqlite:///"):]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return SqliteBucketStore(path)
+    if uri == "memory://":
+        return MemoryBucketStore()
+    raise ValueError(f"Unsupported rate limit storage: {uri}")
+
+
+class RateLimiter:
+    """Rate limits keyed by client IP and phone number."""
+
+    def __init__(self):
+        """Initialize a limiter that allows everything until configured."""
+        self.enabled = False
+        self.store = MemoryBucketStore()
+        self.ip_limit = parse_limit("60/minute")
+        self.phone_limit = parse_limit("5/minute")
+
+    def init_app(self, app):
+        """Read the limits and the bucket store from the app config."""
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        self.store = bucket_store(app.config.get("RATELIMIT_STORAGE_URI", "memory://"))
+        self.ip_limit = parse_limit(app.config.get("RATELIMIT_AUTH_PER_IP", "60/minute"))
+        self.phone_limit = parse_limit(
+            app.config.get("RATELIMIT_AUTH_PER_PHONE", "5/minute")
+        )
+
+    def check(self, scope):
+        """Spend a token for this request, or raise a 429.
+
+        Args:
+            scope (str): Name of the limited endpoint; each has its own buckets.
+        """
+        if not self.enabled:
+            return
+        buckets = [(f"{scope}:ip:{request.remote_addr}", self.ip_limit)]
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and data.get("phone_no"):
+            buckets.append((f"{scope}:phone:{data['phone_no']}", self.phone_limit))
+
+        now = time.time()
+        for key, (capacity, rate) in buckets:
+            try:
+                allowed, retry_after = self.store.take(key, capacity, rate, now)
+            except Exception as e:  # never lock users out because the store failed
+                logging.error(f"Rate limit store failed: {e}")
+                return
+            if not allowed:
+                raise TooManyRequests(
+                    description="Too many requests, please try again later.",
+                    retry_after=max(1, int(retry_after + 0.999)),
+                )
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limited(f):
+    """Apply the authentication rate limits to a view."""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        rate_limiter.check(f.__name__)
+        return f(*args, **kwargs)
+
+    return decorated_function
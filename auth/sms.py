@@ -0,0 +1,93 @@
+"""SMS delivery for one-time codes.
+
+Messages go to the backend named by ``SMS_BACKEND``:
+
+- ``console://`` prints them to stdout, for local development only: it is
+  refused unless the app runs in debug or testing mode, since anyone who
+  can read the logs could use the codes;
+- ``file:///path/to/outbox.log`` appends them to a file;
+- ``memory://`` keeps them in a list, for tests.
+
+A gateway backend only needs a ``send(phone_no, message)`` method.
+"""
+
+from datetime import datetime
+import os
+import threading
+
+
+class ConsoleSmsBackend:
+    """Print messages to stdout."""
+
+    def send(self, phone_no, message):
+        """Print a message addressed to phone_no."""
+        print(f"SMS to {phone_no}: {message}", flush=True)
+
+
+class FileSmsBackend:
+    """Append messages to a file, one per line."""
+
+    def __init__(self, path):
+        """Initialize a backend writing to the file at path."""
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, phone_no, message):
+        """Append a message addressed to phone_no."""
+        line = f"{datetime.utcnow().isoformat()}\t{phone_no}\t{message}\n"
+        with self._lock, open(self.path, "a") as outbox:
+            outbox.write(line)
+
+
+class MemorySmsBackend:
+    """Keep messages in memory."""
+
+    def __init__(self):
+        """Initialize an empty outbox."""
+        self.outbox = []
+
+    def send(self, phone_no, message):
+        """Store a message addressed to phone_no."""
+        self.outbox.append((phone_no, message))
+
+
+def sms_backend(uri):
+    """Return the SMS backend for an ``SMS_BACKEND`` uri."""
+    if uri == "console://":
+        return ConsoleSmsBackend()
+    if uri.startswith("file:///"):
+        path = uri[len("file://"):]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return FileSmsBackend(path)
+    if uri == "memory://":
+        return MemorySmsBackend()
+    raise ValueError(f"Unsupported SMS backend: {uri}")
+
+
+class SmsSender:
+    """Send text messages through the configured backend."""
+
+    def __init__(self):
+        """Initialize a sender that prints messages until configured."""
+        self.backend = ConsoleSmsBackend()
+
+    def init_app(self, app):
+        """Read the backend from the app config.
+
+        Raises:
+            ValueError: If ``SMS_BACKEND`` is unset, or is ``console://``
+                outside debug and testing mode.
+        """
+        uri = app.config.get("SMS_BACKEND")
+        if not uri:
+            raise ValueError("SMS_BACKEND is not set")
+        if uri == "console://" and not (app.debug or app.testing):
+            raise ValueError("The console SMS backend is for development only")
+        self.backend = sms_backend(uri)
+
+    def send(self, phone_no, message):
+        """Send a message to phone_no."""
+        self.backend.send(phone_no, message)
+
+
+sms_sender = SmsSender()
@@ -0,0 +1,104 @@
+"""Cache of verified JWT claims."""
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+from flask_jwt_extended import JWTManager
+
+
+class VerifiedTokenCache:
+    """Worker-local LRU of the claims of tokens whose signature was verified.
+
+    Clients send the same access token with many requests, so the claims of
+    a verified token are kept under a hash of the raw token and handed back
+    without checking the signature again. An entry is only served until the
+    token's ``exp``, and the least recently used entries are dropped past
+    ``JWT_VERIFIED_TOKEN_CACHE_SIZE``. Revocation is not cached here; the
+    blocklist is still checked on every request.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self.max_size = 4096
+        self.reset()
+
+    def init_app(self, app):
+        """Read the cache size from the app config and start empty."""
+        self.max_size = app.config.get("JWT_VERIFIED_TOKEN_CACHE_SIZE", 4096)
+        self.reset()
+
+    def reset(self):
+        """Forget every cached token."""
+        with self._lock:
+            self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(encoded_token) -> bytes:
+        """Return the cache key of a raw token."""
+        if isinstance(encoded_token, str):
+            encoded_token = encoded_token.encode()
+        return hashlib.sha256(encoded_token).digest()
+
+    def get(self, encoded_token):
+        """Return a copy of the cached claims of a token, or None."""
+        if not self.max_size:
+            return None
+        key = self._key(encoded_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at is not None and time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return dict(claims)
+
+    def put(self, encoded_token, claims):
+        """Cache the claims of a token that has just been verified."""
+        if not self.max_size:
+            return
+        key = self._key(encoded_token)
+        with self._lock:
+            self._entries[key] = (dict(claims), claims.get("exp"))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that reuses the claims of tokens it has already verified.
+
+    Every token decoded by flask_jwt_extended goes through
+    ``_decode_jwt_from_config``, so ``token_required``, ``role_required`` and
+    ``decode_token`` all share the cache. Decodes that check a CSRF value or
+    accept expired tokens are not cached.
+    """
+
+    def init_app(self, app, *args, **kwargs):
+        """Register the extension on the app and empty the cache."""
+        super().init_app(app, *args, **kwargs)
+        verified_tokens.init_app(app)
+
+    def _decode_jwt_from_config(
+        self, encoded_token, csrf_value=None, allow_expired=False
+    ) -> dict:
+        """Return the verified claims of a token, from the cache if possible."""
+        cacheable = csrf_value is None and not allow_expired
+        if cacheable:
+            claims = verified_tokens.get(encoded_token)
+            if claims is not None:
+                return claims
+        claims = super()._decode_jwt_from_config(
+            encoded_token, csrf_value, allow_expired
+        )
+        if cacheable:
+            verified_tokens.put(encoded_token, claims)
+        return claims
@@ -7,8 +7,6 @@ import re
 from app import db
 from models.location import Location, Tag
 from models.person import Person
-from models.user import User
-from models.patient import Patient
 
 
 def is_valid_kenyan_phone(phone_no):
@@ -28,14 +26,8 @@ def is_valid_password(password):
 
 
 def get_user_or_patient(phone_no):
-    person = Person.query.filter_by(phone_no=phone_no).first()
-    if not person:
-        return None
-
-    if person.type == "user":
-        return User.query.filter_by(phone_no=phone_no).first()
-    elif person.type == "patient":
-        return Patient.query.filter_by(phone_no=phone_no).first()
+    """Return the user or patient with a phone number, or None."""
+    return Person.find_by_phone_no(phone_no)
 
 
 def error_response(message, status_code):
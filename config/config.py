@@ -15,6 +15,37 @@ posgres_port = os.environ.get("POSTGRES_PORT")
 postgresdb_config = f"postgresql://{posgres_username}:{posgres_password}@{posgres_host}:{posgres_port}/{posgres_database}"
 
 
+def engine_options(database_uri, workers=1, threads=1, max_connections=None) -> dict:
+    """Return SQLALCHEMY_ENGINE_OPTIONS sized for the web server.
+
+    Every worker process has its own pool. A worker serves one request per
+    thread, so the pool keeps one connection per thread and may open as many
+    again under bursts, within its share of the database's connection limit.
+
+    Args:
+        database_uri (str): The database the pool connects to.
+        workers (int): Web server worker processes, e.g. gunicorn's -w.
+        threads (int): Threads per worker.
+        max_connections (int, optional): Connections the database accepts
+            from this app across all workers.
+
+    Returns:
+        dict: The engine options; empty for in-memory SQLite.
+    """
+    if database_uri in ("sqlite://", "sqlite:///:memory:"):
+        return {}  # a single connection, nothing to tune
+    pool_size = max_overflow = max(1, threads)
+    if max_connections:
+        per_worker = max(1, max_connections // max(1, workers))
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    options = {"pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": 10}
+    if not database_uri.startswith("sqlite"):
+        # drop connections the server or a proxy may have closed while idle
+        options.update({"pool_recycle": 60 * 30, "pool_pre_ping": True})
+    return options
+
+
 class Config(object):
     DEBUG = False
     TESTING = False
@@ -34,6 +65,67 @@ class Config(object):
     JWT_BLACKLIST_TOKEN_CHECKS = ["access", "refresh"]
     JWT_ACCESS_TOKEN_EXPIRES = 60 * 60 * 24
     JWT_REFRESH_TOKEN_EXPIRES = 60 * 60 * 24 * 30
+    # how often each worker pulls newly blocklisted tokens, and fully resyncs
+    JWT_BLOCKLIST_REFRESH_SECONDS = 5
+    JWT_BLOCKLIST_RESYNC_SECONDS = 60 * 5
+    # verified tokens whose claims each worker keeps, 0 disables the cache
+    JWT_VERIFIED_TOKEN_CACHE_SIZE = 4096
+    # werkzeug hash method and cost; older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # processes per web worker that hash passwords, 0 hashes on the request thread;
+    # the request still waits for its hash, so this only helps threaded workers
+    # (WEB_THREADS > 1), where it caps concurrent hashes below the thread count
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_TIMEOUT = 30
+    # rate limits on login and password reset, see auth/rate_limit.py
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_AUTH_PER_IP = "60/minute"
+    RATELIMIT_AUTH_PER_PHONE = "5/minute"
+    # one-time codes for password resets, delivered through SMS_BACKEND (auth/sms.py)
+    OTP_LENGTH = 6
+    OTP_TTL_SECONDS = 60 * 10
+    OTP_MAX_ATTEMPTS = 5
+    SMS_BACKEND = os.getenv("SMS_BACKEND", "console://")
+    # number of proxies whose X-Forwarded-For header is trusted for client IPs
+    TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+    # connection pool of the flask development server, which runs threaded
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, threads=4)
+    # how long a worker trusts its cached copy of each user's role version
+    CLAIM_VERSION_CACHE_SECONDS = 30
+    CLAIM_VERSION_CACHE_SIZE = 10000
+    # set on every connection when the database is SQLite (storage/sqlite.py)
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB
+    }
+    # times a statement is re-run after finding the database locked
+    SQLITE_LOCK_RETRIES = 3
+    # read replicas of the database, used by GET requests (storage/replicas.py)
+    SQLALCHEMY_REPLICA_URIS = [
+        uri.replace("postgres://", "postgresql://", 1)
+        for uri in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+        if uri
+    ]
+    SQLALCHEMY_REPLICA_MAX_LAG_SECONDS = 5
+    SQLALCHEMY_REPLICA_CHECK_SECONDS = 10
+    # create indexes missing from existing tables at startup (storage/schema.py);
+    # off by default, every worker would build them at once: use flask create-indexes
+    SCHEMA_CREATE_INDEXES = os.getenv("SCHEMA_CREATE_INDEXES", "0") == "1"
+    # return per-request SQL counts in X-DB-Query-* headers (storage/profiling.py)
+    SQL_PROFILE_HEADERS = True
+    # warn when one statement runs more often than this in a request (N+1 queries)
+    SQL_REPEATED_QUERY_THRESHOLD = 10
+    # page sizes of the list endpoints (api/v1/views/pagination.py)
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 500
+    # rows per statement in DbStorage.bulk_new and bulk_upsert
+    STORAGE_BULK_CHUNK_SIZE = 500
+    # how long a worker trusts its cached row counts before re-reading them
+    STORAGE_COUNT_REFRESH_SECONDS = 60
     # JWT_TOKEN_LOCATION = ["headers", "cookies"]
     # JWT_COOKIE_SECURE = False
     # JWT_COOKIE_CSRF_PROTECT = False
@@ -41,13 +133,31 @@ class Config(object):
     # JWT_COOKIE_DOMAIN = "localhost"
 
 
+# connection pool of gunicorn (see Procfile), sized by the same variables it reads
+gunicorn_engine_options = engine_options(
+    Config.SQLALCHEMY_DATABASE_URI,
+    workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+    threads=int(os.getenv("WEB_THREADS", "1")),
+    max_connections=int(os.getenv("DATABASE_MAX_CONNECTIONS", "20")),
+)
+
+
 class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"  # use in-memory SQLite for testing
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     TESTING = True
 
 
 class ProductionConfig(Config):
     DEBUG = False
+    SQL_PROFILE_HEADERS = False
+    SQLALCHEMY_ENGINE_OPTIONS = gunicorn_engine_options
+    # no default: codes printed by console:// would end up in the logs
+    SMS_BACKEND = os.getenv("SMS_BACKEND")
+    # share rate limit buckets between the gunicorn workers on a host
+    RATELIMIT_STORAGE_URI = os.getenv(
+        "RATELIMIT_STORAGE_URI", "sqlite:///" + os.path.join(basedir, "tmp", "ratelimit.db")
+    )
 
 
 class DevelopmentConfig(Config):
@@ -59,6 +169,7 @@ class DevelopmentConfig(Config):
 class StagingConfig(Config):
     DEVELOPMENT = True
     DEBUG = True
+    SQLALCHEMY_ENGINE_OPTIONS = gunicorn_engine_options
 
 
 configurations = {
@@ -9,44 +9,26 @@ time = "%Y-%m-%dT%H:%M:%S"
 def create_admin(db, User, Role, Person):
     """Create an admin user."""
 
-    # create initial roles
-    # admin
+    # create initial roles - admin, provider and patient - in one commit
     try:
-        admin_role = Role.query.filter_by(name="admin").first()
-        if admin_role:
-            pass
-        else:
-            admin_role = Role(name="admin", description="Administrator")
-            db.session.add(admin_role)
+        descriptions = {
+            "admin": "Administrator",
+            "provider": "Provider",
+            "patient": "Patient",
+        }
+        roles = {
+            role.name: role
+            for role in Role.query.filter(Role.name.in_(descriptions)).all()
+        }
+        for name, description in descriptions.items():
+            if name not in roles:
+                roles[name] = Role(name=name, role_description=description)
+                db.session.add(roles[name])
+        if db.session.new:
             db.session.commit()
+        admin_role = roles["admin"]
     except Exception as e:
-        print(f"Failed to create admin role: {e}")
-        return None
-
-    # provider
-    try:
-        provider_role = Role.query.filter_by(name="provider").first()
-        if provider_role:
-            pass
-        else:
-            provider_role = Role(name="provider", description="Provider")
-            db.session.add(provider_role)
-            db.session.commit()
-    except Exception as e:
-        print(f"Failed to create provider role: {e}")
-        return None
-
-    # patient
-    try:
-        patient_role = Role.query.filter_by(name="patient").first()
-        if patient_role:
-            pass
-        else:
-            patient_role = Role(name="patient", description="Patient")
-            db.session.add(patient_role)
-            db.session.commit()
-    except Exception as e:
-        print(f"Failed to create patient role: {e}")
+        print(f"Failed to create initial roles: {e}")
         return None
 
     # create initial admin user
@@ -3,20 +3,40 @@
 from app import db
 from auth.validators import TAGS_HIERARCHY
 from models.location import Tag
+from storage import storage
 
 def create_tags(TAGS_HIERARCHY=TAGS_HIERARCHY):
-    """"Establish tags."""
-    for index in range(len(TAGS_HIERARCHY)):
-        tag_name = TAGS_HIERARCHY[index].lower()
-        exists = db.session.query(Tag).filter_by(name=tag_name).first()
-        if exists:
-            continue
-        tag_parent = None
-        if index:
-            tag_parent = get_tag(TAGS_HIERARCHY[index - 1])
-        tag_object = Tag(name=tag_name, parent_id=tag_parent.id if tag_parent else None)
-        db.session.add(tag_object)
-        db.session.commit()
+    """"Establish tags.
+
+    Each tag's parent is the tag before it in the hierarchy. Existing tags
+    are left as they are, and nothing is written if all of them exist.
+    """
+    names = [tag_name.lower() for tag_name in TAGS_HIERARCHY]
+    existing = get_tag_ids(names)
+    missing = [name for name in names if name not in existing]
+    if not missing:
+        return
+
+    # insert the missing tags first so their parents have ids to point to
+    storage.bulk_upsert(Tag, [{"name": name} for name in missing], ["name"])
+    ids = get_tag_ids(names)
+    storage.bulk_upsert(
+        Tag,
+        [
+            {"name": name, "parent_id": ids[names[index - 1]] if index else None}
+            for index, name in enumerate(names)
+            if name not in existing
+        ],
+        ["name"],
+        update_columns=["parent_id"],
+    )
+    storage.save()
+
+def get_tag_ids(tag_names) -> dict:
+    """Map the names of existing tags to their ids."""
+    return dict(
+        db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(tag_names)).all()
+    )
 
 def get_tag(tag_name):
     """Get tag object."""
@@ -1,6 +1,7 @@
 """Antenatal profile module."""
 
 from app import db
+from models.serialization import selected
 
 
 class AntenatalProfile(db.Model):
@@ -9,7 +10,9 @@ class AntenatalProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # appointment = db.relationship("Appointment", backref="antenatal_profile_mch_focused")
     # appointment_id = db.Column(db.Integer, db.ForeignKey('appointments.id'))
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient",
         backref=db.backref(
@@ -50,6 +53,7 @@ class AntenatalProfile(db.Model):
     couple_hiv_counseling_done = db.Column(db.Boolean)
     partner_hiv_status = db.Column(db.Text)
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return dictionary representation of the antenatal profile model."""
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        names = selected((c.name for c in self.__table__.columns), fields)
+        return {name: getattr(self, name) for name in names}
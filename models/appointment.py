@@ -2,11 +2,13 @@
 
 from datetime import datetime
 from app import db
+from models.serialization import selected
 from models.person import Person
 from models.patient import Patient
 from models.user import User
 from models.visit import Visit
 from models.role import Role
+from storage import storage
 
 
 time = "%Y-%m-%dT%H:%M:%S"
@@ -18,21 +20,43 @@ class Appointment(db.Model):
     __tablename__ = "appointments"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
+    # indexed by ix_appointments_user_id_appointment_date_id
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     # visit_id = db.Column(db.Integer, db.ForeignKey("visits.id"), nullable=False)
     appointment_date = db.Column(db.DateTime, nullable=False)
     appointment_type = db.Column(db.String(128), nullable=False)
     appointment_status = db.Column(db.String(128), nullable=False)
 
+    # date range scans of the paginated lists, overall and per provider
+    __table_args__ = (
+        db.Index("ix_appointments_appointment_date_id", "appointment_date", "id"),
+        db.Index(
+            "ix_appointments_user_id_appointment_date_id",
+            "user_id",
+            "appointment_date",
+            "id",
+        ),
+    )
+
     def __init__(self, *args, **kwargs):
         """Initialize the appointment class."""
 
+        # resolve the patient and the user in one query
+        references = {
+            key: kwargs[key] for key in ["patient_id", "user_id"] if key in kwargs
+        }
+        people = dict(
+            zip(references, storage.get_many(Person, list(references.values())))
+        )
+
         for key, value in kwargs.items():
-            if key in ["patient_id", "user_id"]:
+            if key in references:
                 model = Patient if key == "patient_id" else User
-                instance = db.session.get(model, value)
-                if instance is not None:
+                instance = people[key]
+                if isinstance(instance, model):
                     setattr(self, key, instance.id)
                 else:
                     raise ValueError(f"Cannot find {model.__name__} with that id")
@@ -50,22 +74,24 @@ class Appointment(db.Model):
         """Represent the appointment class as a string."""
         return "<Appointment: {}>".format(self.id)
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return a dictionary representation of an appointment instance."""
         new_dict = {}
         new_dict["__class__"] = self.__class__.__name__
         if "_sa_instance_state" in new_dict:
             del new_dict["_sa_instance_state"]
-        return {
-            **new_dict,
-            "id": self.id,
-            "patient_id": self.patient_id,
-            "user_id": self.user_id,
-            # "visit_id": self.visit_id,
-            "appointment_date": self.appointment_date,
-            "appointment_type": self.appointment_type,
-            "appointment_status": self.appointment_status,
-        }
+        names = [
+            "id",
+            "patient_id",
+            "user_id",
+            # "visit_id",
+            "appointment_date",
+            "appointment_type",
+            "appointment_status",
+        ]
+        for name in selected(names, fields):
+            new_dict[name] = getattr(self, name)
+        return new_dict
 
     def save(self):
         """Save an appointment."""
@@ -1,6 +1,7 @@
 """Clinical Note Model."""
 
 from app import db
+from models.serialization import selected
 
 
 class ClinicalNote(db.Model):
@@ -9,7 +10,9 @@ class ClinicalNote(db.Model):
     __tablename__ = 'clinical_notes'
 
     id = db.Column(db.Integer, primary_key=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient",
         backref=db.backref(
@@ -24,6 +27,7 @@ class ClinicalNote(db.Model):
     next_visit_date = db.Column(db.Date)
 
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return dictionary representation of the clinical note model."""
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        names = selected((c.name for c in self.__table__.columns), fields)
+        return {name: getattr(self, name) for name in names}
@@ -2,9 +2,12 @@
 
 from datetime import datetime
 from app import db
+from models.serialization import selected
 from models.visit import Visit
 from models.patient import Patient
+from models.person import Person
 from models.user import User
+from storage import storage
 
 
 class Encounter(db.Model):
@@ -13,7 +16,9 @@ class Encounter(db.Model):
     __tablename__ = "encounters"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    visit_id = db.Column(db.Integer, db.ForeignKey("visits.id"), nullable=False)
+    visit_id = db.Column(
+        db.Integer, db.ForeignKey("visits.id"), nullable=False, index=True
+    )
     encounter_type = db.Column(db.String(128), nullable=False)
     # e.g (triage, lab, pharmacy, inpatient, imaging, doctors-consultation, etc)
     patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
@@ -31,8 +36,21 @@ class Encounter(db.Model):
         """Initialize an encounter instance."""
         self.start_datetime = datetime.now()
 
+        # resolve the visit, then the patient and the user in one query
+        references = {
+            key: kwargs[key]
+            for key in ["visit_id", "patient_id", "user_id"]
+            if key in kwargs
+        }
+        people = [key for key in references if key != "visit_id"]
+        instances = dict(
+            zip(people, storage.get_many(Person, [references[key] for key in people]))
+        )
+        if "visit_id" in references:
+            instances["visit_id"] = storage.get(Visit, references["visit_id"])
+
         for key, value in kwargs.items():
-            if key in ["visit_id", "patient_id", "user_id"]:
+            if key in references:
                 model = (
                     Visit
                     if key == "visit_id"
@@ -40,8 +58,8 @@ class Encounter(db.Model):
                     if key == "patient_id"
                     else User
                 )
-                instance = db.session.get(model, value)
-                if instance is not None:
+                instance = instances[key]
+                if isinstance(instance, model):
                     setattr(self, key, instance.id)
                 else:
                     raise ValueError(f"Cannot find {model.__name__} with that id")
@@ -53,17 +71,18 @@ class Encounter(db.Model):
         """End an encounter."""
         self.end_datetime = end_datetime
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return a dictionary representation of an encounter instance."""
-        return {
-            "id": self.id,
-            "visit_id": self.visit_id,
-            "patient_id": self.patient_id,
-            "user_id": self.user_id,
-            "start_datetime": self.start_datetime,
-            "end_datetime": self.end_datetime,
-            "encounter_type": self.encounter_type,
-        }
+        names = [
+            "id",
+            "visit_id",
+            "patient_id",
+            "user_id",
+            "start_datetime",
+            "end_datetime",
+            "encounter_type",
+        ]
+        return {name: getattr(self, name) for name in selected(names, fields)}
 
     def __repr__(self):
         """Return a string representation of an encounter instance."""
@@ -1,6 +1,7 @@
 """Phyical Examination during the first visit model."""
 
 from app import db
+from models.serialization import selected
 
 
 class PhysicalExaminationFirstVisit(db.Model):
@@ -9,7 +10,9 @@ class PhysicalExaminationFirstVisit(db.Model):
     __tablename__ = "physical_examinations_first_visit"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient",
         backref=db.backref(
@@ -37,25 +40,25 @@ class PhysicalExaminationFirstVisit(db.Model):
     genital_ulcer_characteristics = db.Column(db.Text, nullable=True)
 
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return the first visit examination as a dictionary."""
-        fields = {
-            "patient_id": self.patient_id,
-            "general_examination": self.general_examination,
-            "blood_pressure_systolic": self.blood_pressure_systolic,
-            "blood_pressure_diastolic": self.blood_pressure_diastolic,
-            "pulse_rate": self.pulse_rate,
-            "cardiovascular_system": self.cardiovascular_system,
-            "respiratory_system": self.respiratory_system,
-            "abdomen": self.abdomen,
-            "breasts": self.breasts,
-            "external_genitalia_examination": self.external_genitalia_examination,
-            "discharge_present": self.discharge_present,
-            "discharge_characteristics": self.discharge_characteristics,
-            "genital_ulcer_present": self.genital_ulcer_present,
-            "genital_ulcer_characteristics": self.genital_ulcer_characteristics,
-        }
-        return fields
+        names = [
+            "patient_id",
+            "general_examination",
+            "blood_pressure_systolic",
+            "blood_pressure_diastolic",
+            "pulse_rate",
+            "cardiovascular_system",
+            "respiratory_system",
+            "abdomen",
+            "breasts",
+            "external_genitalia_examination",
+            "discharge_present",
+            "discharge_characteristics",
+            "genital_ulcer_present",
+            "genital_ulcer_characteristics",
+        ]
+        return {name: getattr(self, name) for name in selected(names, fields)}
 
 
     def save(self):
@@ -1,4 +1,7 @@
+from sqlalchemy.orm import joinedload
+
 from app import db
+from models.serialization import selected
 
 
 class Tag(db.Model):
@@ -12,9 +15,12 @@ class Tag(db.Model):
 
     parent = db.relationship("Tag", remote_side=[id])
 
-    def to_dict(self) -> dict:
+    def to_dict(self, fields=None) -> dict:
         """Return a dictionary representation of the tag."""
-        return {"id": self.id, "name": self.name, "parent": self.parent_id}
+        values = {"id": "id", "name": "name", "parent": "parent_id"}
+        return {
+            key: getattr(self, values[key]) for key in selected(values, fields)
+        }
 
 
 class Location(db.Model):
@@ -22,21 +28,41 @@ class Location(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey("locations.id"))
+    parent_id = db.Column(db.Integer, db.ForeignKey("locations.id"), index=True)
 
-    tag_id = db.Column(db.Integer, db.ForeignKey("tags.id"), nullable=False)
+    tag_id = db.Column(db.Integer, db.ForeignKey("tags.id"), nullable=False, index=True)
     tag = db.relationship("Tag")
 
+    parent = db.relationship("Location", remote_side=[id])
+
     __table_args__ = (
         db.UniqueConstraint("name", "parent_id", name="unique_location_within_parent"),
     )
 
-    def to_dict(self) -> dict:
-        """Return a dictionary representation of the location."""
-        parent = db.session.query(Location).filter_by(id=self.parent_id).first()
-        return {
-            "id": self.id,
-            "name": self.name.capitalize(),
-            "parent": parent.name.capitalize() if parent else None,
-            "tag": self.tag.to_dict() if self.tag else None,
+    def to_dict(self, fields=None) -> dict:
+        """Return a dictionary representation of the location.
+
+        Lists should load the parent and the tag with the locations, see
+        ``with_parent_and_tag``.
+        """
+        values = {
+            "id": lambda: self.id,
+            "name": lambda: self.name.capitalize(),
+            "parent": lambda: self.parent.name.capitalize() if self.parent else None,
+            "tag": lambda: self.tag.to_dict() if self.tag else None,
         }
+        return {key: values[key]() for key in selected(values, fields)}
+
+    @staticmethod
+    def with_parent_and_tag(query, fields=None):
+        """Load the parent and the tag of a query's locations in the same query.
+
+        Args:
+            query (Query): A query of locations.
+            fields (iterable, optional): The fields to_dict will serialize;
+                the parent and the tag are only loaded if among them.
+                Defaults to None, all fields.
+        """
+        for name in selected(["parent", "tag"], fields):
+            query = query.options(joinedload(getattr(Location, name)))
+        return query
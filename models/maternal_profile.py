@@ -2,6 +2,7 @@
 
 from datetime import timedelta, datetime
 from app import db
+from models.serialization import selected
 
 
 class MaternalProfile(db.Model):
@@ -10,7 +11,9 @@ class MaternalProfile(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
 
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient",
         backref=db.backref(
@@ -44,6 +47,7 @@ class MaternalProfile(db.Model):
             return self.lmp + timedelta(weeks=40)
         return None
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return dictionary representation of the maternal profile model."""
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        names = selected((c.name for c in self.__table__.columns), fields)
+        return {name: getattr(self, name) for name in names}
@@ -2,6 +2,7 @@
 
 
 from app import db
+from models.serialization import selected
 
 
 class MedicalHistory(db.Model):
@@ -10,7 +11,9 @@ class MedicalHistory(db.Model):
     __tablename__ = "medical_history"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient", backref=db.backref("medical_history", lazy=True, uselist=False)
     )
@@ -41,22 +44,22 @@ class MedicalHistory(db.Model):
     family_history_twins = db.Column(db.Boolean, nullable=False)
     family_history_tuberculosis = db.Column(db.Boolean, nullable=False)
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return the medical history as a dictionary."""
-        fields = {
-            "patient_id": self.patient_id,
-            "surgical_operation": self.surgical_operation,
-            "diabetes": self.diabetes,
-            "hypertension": self.hypertension,
-            "blood_transfusion": self.blood_transfusion,
-            "tuberculosis": self.tuberculosis,
-            "drug_allergy": self.drug_allergy,
-            "drug_allergy_details": self.drug_allergy_details,
-            "other_allergies": self.other_allergies,
-            "family_history_twins": self.family_history_twins,
-            "family_history_tuberculosis": self.family_history_tuberculosis,
-        }
-        return fields
+        names = [
+            "patient_id",
+            "surgical_operation",
+            "diabetes",
+            "hypertension",
+            "blood_transfusion",
+            "tuberculosis",
+            "drug_allergy",
+            "drug_allergy_details",
+            "other_allergies",
+            "family_history_twins",
+            "family_history_tuberculosis",
+        ]
+        return {name: getattr(self, name) for name in selected(names, fields)}
 
     def update(self, data):
         """Update a Medical history instance."""
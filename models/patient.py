@@ -1,6 +1,7 @@
 """Define the patient module."""
 
 from app import db
+from models.serialization import selected
 from models.person import Person
 
 
@@ -23,15 +24,16 @@ class Patient(Person):
 
     __mapper_args__ = {"polymorphic_identity": "patient"}
 
-    def to_dict(self):
-        self_dict = {
-            "wcw_no": self.wcw_no,
-            "sys_gen_uniq_no": self.sys_gen_uniq_no,
-            "alt_phone_no": self.alt_phone_no,
-            "marital_status": self.marital_status,
-            "education_level": self.education_level,
-            "next_of_kin": self.next_of_kin,
-            "next_of_kin_relationship": self.next_of_kin_relationship,
-            "next_of_kin_contacts": self.next_of_kin_contacts,
-        }
-        return {**super().to_dict(), **self_dict}
+    def to_dict(self, fields=None):
+        names = [
+            "wcw_no",
+            "sys_gen_uniq_no",
+            "alt_phone_no",
+            "marital_status",
+            "education_level",
+            "next_of_kin",
+            "next_of_kin_relationship",
+            "next_of_kin_contacts",
+        ]
+        self_dict = {name: getattr(self, name) for name in selected(names, fields)}
+        return {**super().to_dict(fields), **self_dict}
@@ -11,14 +11,21 @@ from flask_login import UserMixin  # TODO will remove this
 from itsdangerous import BadSignature, SignatureExpired, TimedSerializer as Serializer
 import logging
 
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import joinedload, with_polymorphic
 from sqlalchemy.sql import func
 from app import db
+from models.serialization import selected
 from auth.blocklist import TokenBlockList
+from auth.claims import (
+    claim_versions,
+    generation_claims,
+    is_token_outdated,
+    role_claims,
+)
+from auth.hashing import password_hasher
 
 from models.role import person_role, Role
 
-storage = db
 time = "%Y-%m-%dT%H:%M:%S"
 
 
@@ -39,17 +46,30 @@ class Person(UserMixin, db.Model):
     surname = db.Column(db.String(128), nullable=False)
     middle_name = db.Column(db.String(128), nullable=True)
     phone_no = db.Column(db.String(128), unique=True, nullable=False)
-    location_id = db.Column(db.String(128), nullable=True)
+    location_id = db.Column(db.String(128), nullable=True, index=True)
     sex = db.Column(db.String(128), nullable=False)
     birth_date = db.Column(db.DateTime, nullable=False)
     password_hash = db.Column(db.String(512), nullable=False)
     # created_by = db.Column(db.Integer, nullable=False)
 
     roles = db.relationship("Role", secondary=person_role, back_populates="person")
+    # bumped on every role change so tokens carrying older roles are ignored
+    role_version = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    # bumped to revoke every token issued to this person so far
+    token_generation = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
 
     type = db.Column(db.String(50))
 
     __mapper_args__ = {"polymorphic_identity": "person", "polymorphic_on": type}
+    # keys of the paginated list endpoints, see api/v1/views/pagination.py
+    __table_args__ = (
+        db.Index("ix_persons_created_at_id", "created_at", "id"),
+        db.Index("ix_persons_birth_date_id", "birth_date", "id"),
+    )
 
     def __init__(self, *args, **kwargs):
         """Initialize a basic person."""
@@ -105,10 +125,10 @@ class Person(UserMixin, db.Model):
         """print representation of person object."""
         return str(self.__dict__)
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """returns a dictionary containing all keys/values of the instance"""
         new_dict = {}
-        for attr in [
+        names = [
             "id",
             "created_at",
             "updated_at",
@@ -119,7 +139,8 @@ class Person(UserMixin, db.Model):
             "location_id",
             "sex",
             "birth_date",
-        ]:
+        ]
+        for attr in selected(names, fields):
             value = getattr(self, attr, None)
             if value is not None:
                 if isinstance(value, datetime):
@@ -129,17 +150,16 @@ class Person(UserMixin, db.Model):
         new_dict["__class__"] = self.__class__.__name__
         if "_sa_instance_state" in new_dict:
             del new_dict["_sa_instance_state"]
-        if self.roles:
+        if selected(["roles"], fields) and self.roles:
             new_dict["roles"] = [role.to_dict() for role in self.roles]
         return new_dict
 
     def update(self, **kwargs):
-        """Update a person."""
+        """Update a person. The changes are committed by the caller."""
         for key, value in kwargs.items():
             if key not in ["id", "created_at", "updated_at"]:
                 setattr(self, key, value)
         self.updated_at = datetime.now()
-        storage.session.commit()
 
     def generate_access_token(self, expiration=60 * 60):
         """Generate the jwt access token."""
@@ -148,7 +168,9 @@ class Person(UserMixin, db.Model):
         # s = Serializer(current_app.config["SECRET_KEY"])
         # return s.dumps({"id": self.id}) # simplify token generation TODO: add expiration
         return create_access_token(
-            identity=self.id, expires_delta=timedelta(seconds=expiration)
+            identity=self.id,
+            expires_delta=timedelta(seconds=expiration),
+            additional_claims={**role_claims(self), **generation_claims(self)},
         )
 
     def generate_refresh_token(self, expiration=60 * 60 * 24):
@@ -156,9 +178,16 @@ class Person(UserMixin, db.Model):
         if self.id is None:
             raise ValueError("Cannot generate token: Person instance has no id")
         return create_refresh_token(
-            identity=self.id, expires_delta=timedelta(seconds=expiration)
+            identity=self.id,
+            expires_delta=timedelta(seconds=expiration),
+            additional_claims=generation_claims(self),
         )
 
+    def revoke_tokens(self):
+        """Revoke every access and refresh token issued to this person so far."""
+        self.token_generation = (self.token_generation or 0) + 1
+        claim_versions.invalidate_on_commit(self.id)
+
     @staticmethod
     def verify_auth_token(token, model):
         """Verify the auth token."""
@@ -168,32 +197,41 @@ class Person(UserMixin, db.Model):
         try:
             if token.startswith("Bearer "):  # strip the bearer prefix
                 token = token[7:]
-            if TokenBlockList.is_jti_blocklisted(token):
-                return None
             data = decode_token(encoded_token=token)
         except Exception as e:
             print(f"Error decoding token: {e}")
             return None
         if "sub" not in data:  # sub = identity
             return None
-        instance = model.query.get(data["sub"])
+        if TokenBlockList.is_jti_blocklisted(data["jti"]) or is_token_outdated(data):
+            return None
+        instance = db.session.get(model, data["sub"])
         return instance
 
     @staticmethod
     def generate_hash(password) -> str:
         """Generate a password hash."""
-        return generate_password_hash(password)
+        return password_hasher.hash(password)
 
     def check_password(self, password) -> bool:
         """Check if a password matches the hash.
         Returns True if it does, False if it doesn't.
         """
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def set_password(self, password) -> None:
         """Set a password."""
         self.password_hash = self.generate_hash(password)
 
+    def rehash_password(self, password) -> bool:
+        """Re-hash a verified password if its hash uses an outdated method.
+        Returns True if the hash was replaced and needs to be saved.
+        """
+        if not password_hasher.needs_rehash(self.password_hash):
+            return False
+        self.set_password(password)
+        return True
+
     def get_role(self, role_name):
         """Get a role."""
         role = None
@@ -208,25 +246,45 @@ class Person(UserMixin, db.Model):
             return role
 
     def assign_role(self, role):
-        """Assign a role to a person."""
+        """Assign a role to a person. The change is committed by the caller."""
         if role is None:
             return
         if role not in self.roles:
             self.roles.append(role)
-            storage.session.add(self)
-            storage.session.commit()
+            self.bump_role_version()
 
     def remove_role(self, role):
-        """Remove a role from a person."""
+        """Remove a role from a person. The change is committed by the caller."""
         if role in self.roles:
             self.roles.remove(role)
-            storage.session.commit()
+            self.bump_role_version()
+
+    def bump_role_version(self):
+        """Mark tokens carrying this person's current roles as outdated."""
+        self.role_version = (self.role_version or 0) + 1
+        if self.id is not None:
+            claim_versions.invalidate_on_commit(self.id)
 
     def assign_roles(self, roles):
         """Assign roles to a person."""
         for role in roles:
             self.assign_role(role)
 
+    @staticmethod
+    def find_by_phone_no(phone_no):
+        """Find the user or patient with a phone number.
+
+        A single query returns the concrete subclass, with its roles loaded
+        for to_dict. Returns None if nobody has the phone number.
+        """
+        person = with_polymorphic(Person, "*")
+        return (
+            db.session.query(person)
+            .options(joinedload(person.roles))
+            .filter(person.phone_no == phone_no)
+            .first()
+        )
+
     def phone_no_exits(self, phone_no):
         """Check if a phone number exists."""
         person = Person.query.filter_by(phone_no=phone_no).first()
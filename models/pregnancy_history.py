@@ -2,6 +2,7 @@
 
 
 from app import db
+from models.serialization import selected
 
 
 class PregnancyHistory(db.Model):
@@ -23,28 +24,30 @@ class PregnancyHistory(db.Model):
     puerperium = db.Column(db.String(255))
 
     # Relationships
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient", backref=db.backref("pregnancy_history", lazy=True)
     )
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return the pregnancy history as a dictionary."""
-        fields = {
-            "patient_id": self.patient_id,
-            "pregnancy_order": self.pregnancy_order,
-            "year": self.year,
-            "number_of_anc_attended": self.number_of_anc_attended,
-            "place_of_childbirth": self.place_of_childbirth,
-            "gestation_in_weeks": self.gestation_in_weeks,
-            "duration_of_labour_hours": self.duration_of_labour_hours,
-            "mode_of_delivery": self.mode_of_delivery,
-            "birth_weight_grams": self.birth_weight_grams,
-            "sex": self.sex,
-            "outcome": self.outcome,
-            "puerperium": self.puerperium,
-        }
-        return fields
+        names = [
+            "patient_id",
+            "pregnancy_order",
+            "year",
+            "number_of_anc_attended",
+            "place_of_childbirth",
+            "gestation_in_weeks",
+            "duration_of_labour_hours",
+            "mode_of_delivery",
+            "birth_weight_grams",
+            "sex",
+            "outcome",
+            "puerperium",
+        ]
+        return {name: getattr(self, name) for name in selected(names, fields)}
 
     def update(self, data):
         """Update a Pregnancy history instance."""
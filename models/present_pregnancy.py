@@ -8,7 +8,9 @@ class PresentPregnancy(db.Model):
     __tablename__ = "present_pregnancies"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     patient = db.relationship(
         "Patient",
         backref=db.backref(
@@ -2,11 +2,12 @@
 
 from marshmallow import Schema, fields
 from app import db
+from models.serialization import selected
 
 person_role = db.Table(
     "person_role",
-    db.Column("person_id", db.Integer, db.ForeignKey("persons.id")),
-    db.Column("role_id", db.Integer, db.ForeignKey("roles.id")),
+    db.Column("person_id", db.Integer, db.ForeignKey("persons.id"), index=True),
+    db.Column("role_id", db.Integer, db.ForeignKey("roles.id"), index=True),
 )
 
 class RoleSchema(Schema):
@@ -37,10 +38,11 @@ class Role(db.Model):
     def __repr__(self):
         return f"<Role {self.name}>"
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return a dictionary representation of a Role object."""
-        return {
-            "id": self.id,
-            "name": self.name,
-            "role_description": self.role_description,
-        }
+        names = [
+            "id",
+            "name",
+            "role_description",
+        ]
+        return {name: getattr(self, name) for name in selected(names, fields)}
@@ -0,0 +1,20 @@
+"""Helpers shared by the to_dict methods of the models."""
+
+
+def selected(names, fields=None) -> list:
+    """Return the names a to_dict should serialize.
+
+    Only the names returned are read from the object, so columns left
+    unloaded by ``load_only`` are not fetched one by one.
+
+    Args:
+        names (iterable): Every name the model serializes, in order.
+        fields (iterable, optional): The names asked for. Defaults to None,
+            all of them.
+
+    Returns:
+        list: The names asked for, in the model's order.
+    """
+    if fields is None:
+        return list(names)
+    return [name for name in names if name in fields]
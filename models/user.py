@@ -2,6 +2,7 @@
 
 from models.person import Person
 from app import db
+from models.serialization import selected
 
 
 class User(Person):
@@ -10,11 +11,15 @@ class User(Person):
     __tablename__ = "users"
 
     id = db.Column(db.Integer, db.ForeignKey("persons.id"), primary_key=True)
-    facility_id = db.Column(db.String(128), nullable=False)
+    facility_id = db.Column(db.String(128), nullable=False, index=True)
     kmpdu_no = db.Column(db.String(128), nullable=True)
 
     __mapper_args__ = {"polymorphic_identity": "user"}
 
-    def to_dict(self):
-        self_dict = {"facility_id": self.facility_id, "kmpdu_no": self.kmpdu_no}
-        return {**super().to_dict(), **self_dict}
+    def to_dict(self, fields=None):
+        names = [
+            "facility_id",
+            "kmpdu_no",
+        ]
+        self_dict = {name: getattr(self, name) for name in selected(names, fields)}
+        return {**super().to_dict(fields), **self_dict}
@@ -1,9 +1,12 @@
 """Module for visit model."""
 
 from app import db
+from models.serialization import selected
 from datetime import datetime
 from models.patient import Patient
+from models.person import Person
 from models.user import User
+from storage import storage
 
 
 class Visit(db.Model):
@@ -12,7 +15,9 @@ class Visit(db.Model):
     __tablename__ = "visits"
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    patient_id = db.Column(db.Integer, db.ForeignKey("patients.id"), nullable=False)
+    patient_id = db.Column(
+        db.Integer, db.ForeignKey("patients.id"), nullable=False, index=True
+    )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     start_datetime = db.Column(db.DateTime, nullable=False)
     end_datetime = db.Column(db.DateTime)
@@ -24,11 +29,19 @@ class Visit(db.Model):
         """Initialize a visit instance."""
         self.start_datetime = start_datetime
 
+        # resolve the patient and the user in one query
+        references = {
+            key: kwargs[key] for key in ["patient_id", "user_id"] if key in kwargs
+        }
+        people = dict(
+            zip(references, storage.get_many(Person, list(references.values())))
+        )
+
         for key, value in kwargs.items():
-            if key in ["patient_id", "user_id"]:
+            if key in references:
                 model = Patient if key == "patient_id" else User
-                instance = db.session.get(model, value)
-                if instance is not None:
+                instance = people[key]
+                if isinstance(instance, model):
                     setattr(self, key, instance.id)
                 else:
                     raise ValueError(f"Cannot find {model.__name__} with that id")
@@ -40,16 +53,17 @@ class Visit(db.Model):
         """End a visit."""
         self.end_datetime = end_datetime
 
-    def to_dict(self):
+    def to_dict(self, fields=None):
         """Return a dictionary representation of a visit instance."""
-        return {
-            "id": self.id,
-            "patient_id": self.patient_id,
-            "user_id": self.user_id,
-            "start_datetime": self.start_datetime,
-            "end_datetime": self.end_datetime,
-            "visit_type": self.visit_type,
-        }
+        names = [
+            "id",
+            "patient_id",
+            "user_id",
+            "start_datetime",
+            "end_datetime",
+            "visit_type",
+        ]
+        return {name: getattr(self, name) for name in selected(names, fields)}
 
     def __repr__(self):
         """Return a string representation of a visit instance."""
@@ -0,0 +1,6 @@
+"""Storage package."""
+
+from app import db
+from storage.db_storage import DbStorage
+
+storage = DbStorage(db)
@@ -0,0 +1,94 @@
+"""Row counts kept up to date from session events."""
+
+from collections import Counter
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+PENDING_KEY = "pending_row_counts"
+
+
+class RowCounts:
+    """Worker-local cache of the number of rows of each model.
+
+    A count is read from the database the first time it is asked for and
+    then adjusted by the inserts and deletes this worker commits through
+    the ORM. Changes made elsewhere, by other workers or by bulk statements,
+    are picked up when the count is re-read, at most
+    ``STORAGE_COUNT_REFRESH_SECONDS`` after it was last loaded.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self.refresh_interval = 60
+        self.reset()
+
+    def init_app(self, app):
+        """Read the refresh interval from the app config and start empty."""
+        self.refresh_interval = app.config.get("STORAGE_COUNT_REFRESH_SECONDS", 60)
+        self.reset()
+
+    def reset(self):
+        """Forget every count."""
+        with self._lock:
+            self._counts = {}
+
+    def get(self, session, cls) -> int:
+        """Return the number of rows of cls, from the cache if it is fresh."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._counts.get(cls)
+            if entry is not None and now - entry[1] < self.refresh_interval:
+                return entry[0]
+        count = session.query(cls).count()
+        with self._lock:
+            self._counts[cls] = (count, now)
+        return count
+
+    def apply(self, deltas):
+        """Adjust the cached counts by committed inserts and deletes."""
+        with self._lock:
+            for cls, delta in deltas.items():
+                entry = self._counts.get(cls)
+                if entry is not None:
+                    self._counts[cls] = (max(0, entry[0] + delta), entry[1])
+
+
+row_counts = RowCounts()
+
+
+def stage_count(session, cls, delta):
+    """Record a change to the number of rows of cls, applied on commit.
+
+    The change also counts towards every class cls inherits from, so adding
+    a Patient adds a Person too.
+    """
+    deltas = session.info.setdefault(PENDING_KEY, Counter())
+    for mapper in inspect(cls).iterate_to_root():
+        deltas[mapper.class_] += delta
+
+
+@event.listens_for(Session, "after_flush")
+def _stage_flushed(session, flush_context):
+    """Stage the inserts and deletes of a flush."""
+    for obj in session.new:
+        stage_count(session, type(obj), 1)
+    for obj in session.deleted:
+        stage_count(session, type(obj), -1)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    """Apply the staged changes once they are committed."""
+    deltas = session.info.pop(PENDING_KEY, None)
+    if deltas:
+        row_counts.apply(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    """Drop the staged changes of a transaction that was rolled back."""
+    session.info.pop(PENDING_KEY, None)
@@ -1,7 +1,16 @@
+from contextlib import contextmanager
+import json
+
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, inspect, insert, or_, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from storage.counts import row_counts, stage_count
 
 """Database storage engine module."""
 
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 
 class DbStorage:
     """Database storage engine class.
@@ -37,6 +46,80 @@ class DbStorage:
         else:
             return self.db.session.query(cls).all()
 
+    def iterate(self, cls, batch_size=1000, query=None):
+        """Yield every object of a given class, loading them in batches.
+
+        Rows are fetched ``batch_size`` at a time with ``yield_per``, which
+        streams them through a server-side cursor on dialects that support
+        one (e.g. PostgreSQL), so memory use does not grow with the table.
+        Keep the session free of other queries until the loop is done.
+
+        Args:
+            cls (type): The class to query.
+            batch_size (int, optional): Rows per batch. Defaults to 1000.
+            query (Query, optional): A filtered query of cls to iterate
+                instead of the whole table.
+
+        Yields:
+            object: The objects, in no particular order.
+        """
+        if self.db is None:
+            return
+        if query is None:
+            query = self.db.session.query(cls)
+        yield from query.yield_per(batch_size)
+
+    def page(
+        self, cls, after_id=None, limit=50, order="asc", query=None, sort=None
+    ) -> tuple:
+        """Return a page of objects ordered by id, starting after a cursor.
+
+        Keyset pagination: the page is found through the primary key index
+        with ``id > after_id`` (or ``<`` when descending) instead of an
+        OFFSET, so every page costs the same however deep it is. With
+        ``sort``, objects are ordered by ``(sort, id)`` and the cursor is
+        that pair; an index on both columns keeps this as cheap.
+
+        Args:
+            cls (type): The class to query.
+            after_id (int, optional): The id the previous page ended at, or
+                its (sort value, id) pair when sort is given. Defaults to
+                None, the first page.
+            limit (int, optional): The page size. Defaults to 50.
+            order (str, optional): "asc" or "desc". Defaults to "asc".
+            query (Query, optional): A filtered query of cls to page through
+                instead of the whole table.
+            sort (InstrumentedAttribute, optional): A non-nullable column to
+                order by before the id.
+
+        Returns:
+            tuple: (list of objects, the value to pass as after_id for the
+            next page, or None if this is the last page).
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid order: {order}")
+        if self.db is None:
+            return [], None
+        if query is None:
+            query = self.db.session.query(cls)
+        # the base table's id under joined inheritance (persons.id for a
+        # Patient), so (sort, id) stays on one table and its index
+        id_column = inspect(cls).primary_key[0]
+        columns = [id_column] if sort is None else [sort, id_column]
+        if after_id is not None:
+            key = tuple_(*columns) if sort is not None else id_column
+            after = tuple_(*after_id) if sort is not None else after_id
+            query = query.filter(key > after if order == "asc" else key < after)
+        keys = [getattr(column, order)() for column in columns]
+        # fetch one extra row to learn whether another page follows
+        items = query.order_by(*keys).limit(limit + 1).all()
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        if sort is None:
+            return items, items[-1].id
+        return items, (getattr(items[-1], sort.key), items[-1].id)
+
     def new(self, obj):
         """Add a new object to the database.
 
@@ -46,6 +129,163 @@ class DbStorage:
         if self.db is not None:
             self.db.session.add(obj)
 
+    def bulk_new(self, cls, rows, chunk_size=None) -> list:
+        """Insert many rows of a class in a few executemany round trips.
+
+        Rows are inserted in chunks of ``chunk_size`` (``STORAGE_BULK_CHUNK_SIZE``
+        by default) without loading them into the session. Call ``save`` to
+        commit them.
+
+        Args:
+            cls (type): The class to insert into.
+            rows (list): Dicts of column values, or unsaved objects of cls.
+            chunk_size (int, optional): Rows per statement.
+
+        Returns:
+            list: The ids of the new rows, in order, if the dialect supports
+            RETURNING; otherwise None.
+        """
+        if self.db is None:
+            return None
+        rows = self._row_dicts(cls, rows)
+        if not rows:
+            return []
+        statement = insert(cls)
+        returning = self.db.session.get_bind().dialect.insert_executemany_returning
+        if returning:
+            statement = statement.returning(cls.id)
+        ids = []
+        for chunk in self._chunks(rows, chunk_size):
+            result = self.db.session.execute(statement, chunk)
+            if returning:
+                ids.extend(result.scalars())
+        stage_count(self.db.session, cls, len(rows))
+        return ids if returning else None
+
+    def bulk_upsert(
+        self, cls, rows, index_elements, update_columns=None, chunk_size=None
+    ):
+        """Insert many rows, updating or skipping those that already exist.
+
+        Uses ``INSERT ... ON CONFLICT`` on SQLite and PostgreSQL, in chunks
+        of ``chunk_size`` (``STORAGE_BULK_CHUNK_SIZE`` by default). Other
+        databases look up which rows exist first, then insert and update in
+        bulk; unlike ``ON CONFLICT`` this races with concurrent inserts of
+        the same rows, which then fail on the unique index. Call ``save`` to
+        commit the changes.
+
+        Args:
+            cls (type): The class to upsert into; it must map a single table.
+            rows (list): Dicts of column values, or unsaved objects of cls.
+            index_elements (list): Names of the columns of a unique index
+                that identify an existing row.
+            update_columns (list, optional): Columns to overwrite on existing
+                rows. Defaults to None, which leaves existing rows untouched.
+            chunk_size (int, optional): Rows per statement.
+        """
+        if self.db is None:
+            return
+        rows = self._row_dicts(cls, rows)
+        if not rows:
+            return
+        dialect = self.db.session.get_bind().dialect.name
+        if dialect not in UPSERT_INSERTS:
+            for chunk in self._chunks(rows, chunk_size):
+                self._upsert_chunk(cls, chunk, index_elements, update_columns)
+            return
+        statement = UPSERT_INSERTS[dialect](cls)
+        if update_columns:
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={
+                    name: getattr(statement.excluded, name) for name in update_columns
+                },
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+        for chunk in self._chunks(rows, chunk_size):
+            self.db.session.execute(statement, chunk)
+
+    def _upsert_chunk(self, cls, rows, index_elements, update_columns=None):
+        """Upsert rows without ``ON CONFLICT``: select, then insert or update."""
+        primary_key = [column.key for column in inspect(cls).primary_key]
+        columns = [getattr(cls, name) for name in index_elements]
+        key = lambda row: tuple(row.get(name) for name in index_elements)
+        wanted = {key(row) for row in rows}
+        matches = or_(
+            *(and_(*(c == v for c, v in zip(columns, values))) for values in wanted)
+        )
+        existing = {
+            tuple(found[: len(columns)]): found[len(columns):]
+            for found in self.db.session.query(
+                *columns, *(getattr(cls, name) for name in primary_key)
+            ).filter(matches)
+        }
+        new, updates = {}, []
+        for row in rows:
+            if key(row) in existing:
+                if update_columns:
+                    changes = {name: row[name] for name in update_columns}
+                    changes.update(zip(primary_key, existing[key(row)]))
+                    updates.append(changes)
+            elif key(row) not in new:
+                new[key(row)] = dict(row)
+            elif update_columns:
+                # like ON CONFLICT, a later duplicate in rows updates the first
+                new[key(row)].update({name: row[name] for name in update_columns})
+        if new:
+            self.db.session.execute(insert(cls), list(new.values()))
+        if updates:
+            self.db.session.execute(update(cls), updates)
+
+    @staticmethod
+    def _row_dicts(cls, rows) -> list:
+        """Return rows as dicts of column values, converting objects of cls."""
+        keys = [attr.key for attr in inspect(cls).column_attrs]
+        dicts = []
+        for row in rows:
+            if not isinstance(row, dict):
+                state = inspect(row).dict
+                row = {key: state[key] for key in keys if key in state}
+            dicts.append(row)
+        return dicts
+
+    @staticmethod
+    def _chunks(rows, chunk_size=None):
+        """Yield successive slices of rows."""
+        if chunk_size is None:
+            chunk_size = current_app.config.get("STORAGE_BULK_CHUNK_SIZE", 500)
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+    @contextmanager
+    def unit_of_work(self):
+        """Group the changes made in a block into one flush and one commit.
+
+        Autoflush is off inside the block, so staged changes are written
+        together when the block ends; queries made inside it do not see
+        them. The changes are rolled back if the block raises, including
+        through ``abort``. A unit of work opened inside another joins it,
+        and only the outermost one commits.
+
+        Yields:
+            Session: The session the changes are staged on.
+        """
+        session = self.db.session
+        depth = session.info.get("unit_of_work_depth", 0)
+        session.info["unit_of_work_depth"] = depth + 1
+        try:
+            with session.no_autoflush:
+                yield session
+            if depth == 0:
+                session.commit()
+        except Exception:
+            if depth == 0:
+                session.rollback()
+            raise
+        finally:
+            session.info["unit_of_work_depth"] = depth
+
     def save(self):
         """Save changes to the database."""
         if self.db is not None:
@@ -83,11 +323,53 @@ class DbStorage:
         if self.db is None:
             return None
         else:
-            return self.db.session.query(cls).get(id)
+            return self.db.session.get(cls, id)
+
+    def get_many(self, cls, ids, chunk_size=None) -> list:
+        """Get many objects of a class by id in as few queries as possible.
+
+        Objects already loaded in the session are reused; the rest are
+        fetched with ``IN`` queries of up to ``chunk_size`` ids
+        (``STORAGE_BULK_CHUNK_SIZE`` by default). With a polymorphic base
+        class such as Person, each object comes back as its own subclass.
+
+        Args:
+            cls (type): The class of the objects.
+            ids (list): The IDs of the objects.
+            chunk_size (int, optional): IDs per query.
+
+        Returns:
+            list: The object for each id, in the same order, or None for ids
+            that do not exist.
+        """
+        if self.db is None:
+            return [None] * len(ids)
+        session = self.db.session
+        id_type = inspect(cls).primary_key[0].type.python_type
+        keys = []
+        for id in ids:
+            try:
+                keys.append(None if id is None else id_type(id))
+            except (TypeError, ValueError):
+                keys.append(None)
+
+        found = {}
+        for key in set(keys) - {None}:
+            obj = session.identity_map.get(session.identity_key(cls, key))
+            if obj is not None and isinstance(obj, cls) and not inspect(obj).expired:
+                found[key] = obj
+        missing = [key for key in set(keys) - {None} if key not in found]
+        for chunk in self._chunks(missing, chunk_size):
+            for obj in session.query(cls).filter(cls.id.in_(chunk)):
+                found[obj.id] = obj
+        return [found.get(key) for key in keys]
 
     def count(self, cls=None) -> int:
         """Count the number of objects in storage.
 
+        Counts are cached per worker and kept current by the inserts and
+        deletes committed through the session; see ``storage.counts``.
+
         Args:
             cls (type, optional): The class to count. Defaults to None.
 
@@ -97,4 +379,41 @@ class DbStorage:
         if self.db is None:
             return 0
         else:
-            return self.db.session.query(cls).count()
+            return row_counts.get(self.db.session, cls)
+
+    def estimate(self, cls, query=None) -> int:
+        """Estimate the number of objects a query returns, cheaply.
+
+        Without filters this is ``count``. On PostgreSQL a filtered query is
+        estimated by the planner without running it; other databases count
+        it.
+
+        Args:
+            cls (type): The class the query is of.
+            query (Query, optional): A filtered query of cls. Defaults to
+                None, the whole table.
+
+        Returns:
+            int: The estimated number of objects.
+        """
+        if self.db is None:
+            return 0
+        if query is None or query.whereclause is None:
+            return self.count(cls)
+        query = query.order_by(None)
+        dialect = self.db.session.get_bind().dialect
+        if dialect.name == "postgresql":
+            # the filter values stay bound parameters, never inlined SQL
+            compiled = query.statement.compile(dialect=dialect)
+            params = compiled.construct_params()
+            if compiled.positional:
+                params = tuple(params[name] for name in compiled.positiontup)
+            plan = (
+                self.db.session.connection()
+                .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)
+                .scalar()
+            )
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        return query.count()
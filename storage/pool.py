@@ -0,0 +1,168 @@
+"""Connection pool instrumentation."""
+
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Counters of one connection pool."""
+
+    def __init__(self):
+        """Initialize zeroed counters."""
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        """Record how long a request for a connection waited."""
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_checkout(self, checked_out):
+        """Record a checkout, with the number of connections now in use."""
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_checkin(self):
+        """Record a connection returned to the pool."""
+        with self._lock:
+            self.checkins += 1
+
+    def record_invalidation(self):
+        """Record a connection discarded after an error."""
+        with self._lock:
+            self.invalidations += 1
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the pool and its counters."""
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        """Check out a connection, recording the time spent waiting."""
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - start, timed_out)
+
+    def recreate(self):
+        """Return a new pool that keeps counting into the same stats."""
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class PoolMetrics:
+    """Report the state and counters of the app's connection pools.
+
+    Engines whose options carry ``pool_size`` use ``TimedQueuePool`` so the
+    time spent waiting for a connection is measured; checkouts, checkins
+    and invalidations are counted through pool events.
+    """
+
+    def __init__(self):
+        """Initialize a registry with no engines."""
+        self._lock = threading.Lock()
+        self._engines = {}
+
+    def init_app(self, app):
+        """Use the timed pool for the app's engines. Call before db.init_app."""
+        options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+        if "pool_size" in options:
+            options.setdefault("poolclass", TimedQueuePool)
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        with self._lock:
+            self._engines = {}
+
+    def watch(self, name, engine, options=None):
+        """Report an engine's pool under name.
+
+        Args:
+            name (str): The name the pool is reported under.
+            engine (Engine): The engine of the pool.
+            options (dict, optional): The options the engine was created with.
+        """
+        options = options or {}
+        stats = getattr(engine.pool, "stats", None) or PoolStats()
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            stats.record_checkout(getattr(engine.pool, "checkedout", int)())
+
+        def on_checkin(dbapi_connection, connection_record):
+            stats.record_checkin()
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            stats.record_invalidation()
+
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "checkin", on_checkin)
+        event.listen(engine, "invalidate", on_invalidate)
+        with self._lock:
+            self._engines[name] = (engine, stats, options)
+
+    def forget(self, name):
+        """Stop reporting an engine."""
+        with self._lock:
+            self._engines.pop(name, None)
+
+    def snapshot(self) -> dict:
+        """Return the current state and counters of every watched pool."""
+        with self._lock:
+            engines = dict(self._engines)
+        report = {}
+        for name, (engine, stats, options) in engines.items():
+            pool = engine.pool
+            entry = {"pool_class": type(pool).__name__}
+            if isinstance(pool, QueuePool):
+                entry.update(
+                    {
+                        "pool_size": pool.size(),
+                        # QueuePool's default when the options leave it out
+                        "max_overflow": options.get("max_overflow", 10),
+                        "checked_out": pool.checkedout(),
+                        "idle": pool.checkedin(),
+                        "overflow": max(0, pool.overflow()),
+                    }
+                )
+            with stats._lock:
+                waits = stats.checkouts or 1
+                entry.update(
+                    {
+                        "checkouts": stats.checkouts,
+                        "checkins": stats.checkins,
+                        "peak_checked_out": stats.peak_checked_out,
+                        "timeouts": stats.timeouts,
+                        "invalidations": stats.invalidations,
+                        "checkout_wait_ms": {
+                            "total": round(stats.wait_total * 1000, 3),
+                            "avg": round(stats.wait_total * 1000 / waits, 3),
+                            "max": round(stats.wait_max * 1000, 3),
+                        },
+                    }
+                )
+            report[name] = entry
+        return report
+
+
+pool_metrics = PoolMetrics()
@@ -0,0 +1,87 @@
+"""Per-request SQL statement counting.
+
+Every statement run while serving a request is counted and timed through
+the engine cursor events. When ``SQL_PROFILE_HEADERS`` is on, the totals are
+returned in the ``X-DB-Query-Count`` and ``X-DB-Query-Time-Ms`` headers. A
+warning is logged whenever one statement runs more than
+``SQL_REPEATED_QUERY_THRESHOLD`` times in a request, which is the mark of an
+N+1 query.
+"""
+
+from collections import Counter
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestQueries:
+    """The statements run while serving one request."""
+
+    def __init__(self):
+        """Initialize empty totals."""
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+
+class QueryProfiler:
+    """Count and time the SQL statements of each request."""
+
+    def __init__(self):
+        """Initialize a profiler that counts without reporting."""
+        self.headers = False
+        self.threshold = 10
+
+    def init_app(self, app):
+        """Read the reporting settings and report at the end of each request."""
+        self.headers = app.config.get("SQL_PROFILE_HEADERS", False)
+        self.threshold = app.config.get("SQL_REPEATED_QUERY_THRESHOLD", 10)
+        app.after_request(self.report)
+
+    @staticmethod
+    def current():
+        """Return the statements of the current request, or None outside one."""
+        if not has_request_context():
+            return None
+        if "db_queries" not in g:
+            g.db_queries = RequestQueries()
+        return g.db_queries
+
+    def report(self, response):
+        """Add the totals to the response and warn about repeated statements."""
+        queries = self.current()
+        if queries is None:
+            return response
+        if self.headers:
+            response.headers["X-DB-Query-Count"] = str(queries.count)
+            response.headers["X-DB-Query-Time-Ms"] = f"{queries.seconds * 1000:.1f}"
+        for statement, count in queries.statements.items():
+            if count > self.threshold:
+                logging.warning(
+                    f"{request.method} {request.path} ran a query {count} times: "
+                    f"{' '.join(statement.split())[:200]}"
+                )
+        return response
+
+
+query_profiler = QueryProfiler()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    """Note when a statement starts."""
+    conn.info["query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    """Add a finished statement to the current request's totals."""
+    start = conn.info.pop("query_start", None) or time.perf_counter()
+    queries = query_profiler.current()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += time.perf_counter() - start
+        queries.statements[statement] += 1
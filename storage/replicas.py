@@ -0,0 +1,189 @@
+"""Routing of read-only requests to read replicas.
+
+``SQLALCHEMY_REPLICA_URIS`` lists replicas of the primary database. Each GET
+request to the API is given one of them, in round-robin order, and the ORM
+SELECTs it runs go there until the request writes anything; from then on it
+reads from the primary too, so it sees its own changes. Flushes and other
+writes always go to the primary, and so do the reads made inside
+``reads_from_primary``, such as the caller's roles and revocation state.
+
+A replica is probed before use at most every ``SQLALCHEMY_REPLICA_CHECK_SECONDS``.
+Replicas that cannot be reached, lag the primary by more than
+``SQLALCHEMY_REPLICA_MAX_LAG_SECONDS`` (PostgreSQL only) or fail a query are
+skipped until their next probe, and requests fall back to the primary.
+"""
+
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from flask import request
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.orm import Session
+
+from app import db
+from storage.pool import pool_metrics
+
+REPLICA_KEY = "replica"
+WROTE_KEY = "wrote"
+PRIMARY_KEY = "primary_reads"
+
+
+class ReplicaRouter:
+    """Hand out healthy read replicas in round-robin order."""
+
+    def __init__(self):
+        """Initialize a router with no replicas."""
+        self._lock = threading.Lock()
+        self.engines = []
+        self.blueprints = {"api_bp"}
+        self.max_lag = 5
+        self.check_interval = 10
+        self._health = {}
+        self._next = 0
+
+    def init_app(self, app):
+        """Connect to the app's replicas and route its GET requests."""
+        self.max_lag = app.config.get("SQLALCHEMY_REPLICA_MAX_LAG_SECONDS", 5)
+        self.check_interval = app.config.get("SQLALCHEMY_REPLICA_CHECK_SECONDS", 10)
+        self.connect(
+            app.config.get("SQLALCHEMY_REPLICA_URIS", []),
+            app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        )
+        app.before_request(self.route_request)
+        app.teardown_request(self.end_request)
+
+    def connect(self, uris, engine_options=None):
+        """Replace the replicas with engines for the given database URIs."""
+        self.dispose()
+        engines = [create_engine(uri, **(engine_options or {})) for uri in uris]
+        for index, engine in enumerate(engines):
+            event.listen(engine, "handle_error", self._on_error)
+            pool_metrics.watch(f"replica_{index}", engine, engine_options)
+        with self._lock:
+            self.engines = engines
+
+    def dispose(self):
+        """Close the connections of the current replicas and forget them."""
+        with self._lock:
+            for index, engine in enumerate(self.engines):
+                engine.dispose()
+                pool_metrics.forget(f"replica_{index}")
+            self.engines = []
+            self._health = {}
+            self._next = 0
+
+    def route_request(self):
+        """Send the reads of a read-only API request to a replica."""
+        db.session.info.pop(REPLICA_KEY, None)
+        db.session.info.pop(WROTE_KEY, None)
+        if request.method != "GET" or request.blueprint not in self.blueprints:
+            return
+        engine = self.choose()
+        if engine is not None:
+            db.session.info[REPLICA_KEY] = engine
+
+    def end_request(self, error=None):
+        """Stop routing once the request is over."""
+        db.session.info.pop(REPLICA_KEY, None)
+        db.session.info.pop(WROTE_KEY, None)
+
+    def choose(self):
+        """Return the next healthy replica, or None to use the primary."""
+        for _ in range(len(self.engines)):
+            with self._lock:
+                if not self.engines:
+                    return None
+                engine = self.engines[self._next % len(self.engines)]
+                self._next += 1
+            if self.is_healthy(engine):
+                return engine
+        return None
+
+    def is_healthy(self, engine) -> bool:
+        """Return whether a replica may be used, probing it when due."""
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._health.get(engine, (None, None))
+        if healthy is not None and now - checked_at < self.check_interval:
+            return healthy
+        healthy = self.probe(engine)
+        with self._lock:
+            self._health[engine] = (healthy, now)
+        return healthy
+
+    def probe(self, engine) -> bool:
+        """Return whether a replica answers and is not too far behind."""
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == "postgresql":
+                    lag = connection.execute(
+                        text(
+                            "SELECT EXTRACT(EPOCH FROM "
+                            "now() - pg_last_xact_replay_timestamp())"
+                        )
+                    ).scalar()
+                    if lag is not None and lag > self.max_lag:
+                        logging.warning(f"Replica {engine.url} lags by {lag}s")
+                        return False
+                else:
+                    connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logging.warning(f"Replica {engine.url} is unavailable: {e}")
+            return False
+        return True
+
+    def mark_unhealthy(self, engine):
+        """Skip a replica until its next probe."""
+        with self._lock:
+            self._health[engine] = (False, time.monotonic())
+
+    def _on_error(self, context):
+        """Take a replica out of rotation when a query on it fails."""
+        self.mark_unhealthy(context.engine)
+
+
+replica_router = ReplicaRouter()
+
+
+@contextmanager
+def reads_from_primary():
+    """Run the ORM reads made inside the block on the primary.
+
+    For reads that must not lag behind the primary, like the checks that a
+    caller's roles or tokens have not been revoked.
+    """
+    session = db.session
+    depth = session.info.get(PRIMARY_KEY, 0)
+    session.info[PRIMARY_KEY] = depth + 1
+    try:
+        yield
+    finally:
+        session.info[PRIMARY_KEY] = depth
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _route_to_replica(orm_execute_state):
+    """Run a read-only request's SELECTs on its replica."""
+    session = orm_execute_state.session
+    engine = session.info.get(REPLICA_KEY)
+    if engine is None or session.info.get(PRIMARY_KEY):
+        return None
+    if not orm_execute_state.is_select or session.info.get(WROTE_KEY):
+        session.info[WROTE_KEY] = True
+        return None
+    try:
+        return orm_execute_state.invoke_statement(bind_arguments={"bind": engine})
+    except exc.DBAPIError as e:
+        # the replica failed; answer this request from the primary instead
+        logging.warning(f"Query on replica {engine.url} failed: {e}")
+        session.info.pop(REPLICA_KEY, None)
+        return None
+
+
+@event.listens_for(Session, "before_flush")
+def _stop_replica_reads(session, flush_context, instances):
+    """Read from the primary once a request has written anything."""
+    if session.info.get(REPLICA_KEY) is not None:
+        session.info[WROTE_KEY] = True
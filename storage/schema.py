@@ -0,0 +1,148 @@
+"""In-place schema upgrades for existing databases."""
+
+import logging
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import exc, inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+
+def missing_columns(db: SQLAlchemy) -> list:
+    """Return the model columns that are missing from existing tables.
+
+    Args:
+        db (SQLAlchemy): The SQLAlchemy instance.
+
+    Returns:
+        list: The missing columns, as ``sqlalchemy.Column`` objects.
+    """
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # create_all takes care of whole tables
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(
+            column for column in table.columns if column.name not in existing
+        )
+    return missing
+
+
+def upgrade_schema(db: SQLAlchemy) -> list:
+    """Add columns declared on the models to tables created before them.
+
+    ``db.create_all`` only creates tables that do not exist yet, so a column
+    added to a model never reaches a database created by an older release.
+    New columns must be nullable or carry a server default for this to work.
+
+    Every web worker runs this on boot, before the app's first query needs
+    the new columns, so workers may race to add the same column. Each column
+    is added on its own and a column another worker added first is skipped.
+
+    Args:
+        db (SQLAlchemy): The SQLAlchemy instance.
+
+    Returns:
+        list: The columns that were added.
+    """
+    added = []
+    if_not_exists = "IF NOT EXISTS " if db.engine.dialect.name == "postgresql" else ""
+    for column in missing_columns(db):
+        ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {column.table.name} "
+                        f"ADD COLUMN {if_not_exists}{ddl}"
+                    )
+                )
+        except exc.DBAPIError:
+            if column in missing_columns(db):
+                raise
+            # another worker added it between the check and the ALTER
+            logging.info(f"Column {column.table.name}.{column.name} already added")
+            continue
+        logging.info(f"Added column {column.table.name}.{column.name}")
+        added.append(column)
+    return added
+
+
+def missing_indexes(db: SQLAlchemy) -> list:
+    """Return the model indexes that are missing from existing tables.
+
+    Args:
+        db (SQLAlchemy): The SQLAlchemy instance.
+
+    Returns:
+        list: The missing indexes, as ``sqlalchemy.Index`` objects.
+    """
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(
+            index
+            for index in sorted(table.indexes, key=lambda index: index.name)
+            if index.name not in existing
+        )
+    return missing
+
+
+def create_missing_indexes(db: SQLAlchemy) -> list:
+    """Create indexes declared on the models on tables created before them.
+
+    Building an index can take a while on a large table. On PostgreSQL the
+    indexes are built ``CONCURRENTLY`` so writes go on meanwhile; other
+    databases lock the table until the build is done. Run it once per
+    deploy with ``flask create-indexes`` rather than from every worker.
+    Indexes created by someone else in the meantime are skipped.
+
+    Args:
+        db (SQLAlchemy): The SQLAlchemy instance.
+
+    Returns:
+        list: The indexes that were created.
+    """
+    created = []
+    engine = db.engine
+    concurrently = engine.dialect.name == "postgresql"
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    with connection:
+        for index in missing_indexes(db):
+            ddl = str(
+                CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect)
+            )
+            if concurrently:
+                ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+            try:
+                connection.exec_driver_sql(ddl)
+            except exc.DBAPIError as e:
+                if "already exists" not in str(e.orig):
+                    raise
+                logging.info(f"Index {index.name} was created meanwhile")
+                continue
+            logging.info(f"Created index {index.name} on {index.table.name}")
+            created.append(index)
+    return created
+
+
+def report_missing_indexes(db: SQLAlchemy) -> list:
+    """Log a warning for every model index missing from the database.
+
+    Args:
+        db (SQLAlchemy): The SQLAlchemy instance.
+
+    Returns:
+        list: The missing indexes.
+    """
+    missing = missing_indexes(db)
+    for index in missing:
+        columns = ", ".join(column.name for column in index.columns)
+        logging.warning(
+            f"Missing index {index.name} on {index.table.name} ({columns})"
+        )
+    return missing
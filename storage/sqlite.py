@@ -0,0 +1,119 @@
+"""Concurrency settings for deployments that run on the SQLite fallback.
+
+Every connection gets the ``SQLITE_PRAGMAS`` (WAL journal, a busy timeout,
+...), so readers no longer block the writer. Writes are still one at a
+time: a session that starts flushing holds the worker's write lock until
+its transaction ends, and a statement that finds the database locked by
+another worker is run again, up to ``SQLITE_LOCK_RETRIES`` times. Only the
+statement is retried, never the view, so nothing the view did before it
+(rate limiting, OTPs, ...) happens twice.
+"""
+
+import random
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+
+LOCK_KEY = "sqlite_write_lock"
+
+
+def is_locked_error(error) -> bool:
+    """Return True if a database error means another connection holds a lock."""
+    message = str(getattr(error, "orig", error)).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+def apply_pragmas(engine, pragmas):
+    """Run the pragmas on every new connection of a SQLite engine."""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+class SqliteWriteGuard:
+    """Serialize and retry the writes of a SQLite-backed app."""
+
+    def __init__(self):
+        """Initialize a guard that is off until configured."""
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.retries = 3
+        self.backoff = 0.05
+        self.timeout = 5.0
+
+    def init_app(self, app):
+        """Tune the app's SQLite engine and guard its writes.
+
+        Does nothing when the app uses another database.
+        """
+        self.enabled = db.engine.dialect.name == "sqlite"
+        if not self.enabled:
+            return
+        self.retries = app.config.get("SQLITE_LOCK_RETRIES", 3)
+        pragmas = app.config.get("SQLITE_PRAGMAS", {})
+        self.timeout = pragmas.get("busy_timeout", 5000) / 1000
+        apply_pragmas(db.engine, pragmas)
+        event.listen(db.engine, "do_execute", self.execute)
+        event.listen(db.engine, "do_executemany", self.executemany)
+        db.engine.dispose()  # reconnect with the pragmas applied
+
+    def retry(self, run):
+        """Call run, retrying with backoff while the database is locked.
+
+        A retry can only wait for another worker's write to finish. If that
+        write committed after this transaction first read, the snapshot is
+        stale and every retry fails; the error is then raised as usual.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                run()
+                return True  # tell SQLAlchemy the statement has run
+            except sqlite3.OperationalError as e:
+                if not is_locked_error(e) or attempt == self.retries:
+                    raise
+            time.sleep(self.backoff * 2**attempt * (0.5 + random.random()))
+
+    def execute(self, cursor, statement, parameters, context):
+        """Run a statement, retrying while the database is locked."""
+        return self.retry(lambda: cursor.execute(statement, parameters))
+
+    def executemany(self, cursor, statement, parameters, context):
+        """Run a statement for many rows, retrying while the database is locked."""
+        return self.retry(lambda: cursor.executemany(statement, parameters))
+
+    def acquire(self, session):
+        """Take the write lock for a session about to write, once per transaction."""
+        if self.enabled and not session.info.get(LOCK_KEY):
+            # a session left uncommitted must not block the worker for good;
+            # past the timeout, SQLite's own locking still keeps writes apart
+            session.info[LOCK_KEY] = self._lock.acquire(timeout=self.timeout)
+
+    def release(self, session):
+        """Give the write lock back once the session's transaction has ended."""
+        if session.info.pop(LOCK_KEY, False):
+            self._lock.release()
+
+
+sqlite_guard = SqliteWriteGuard()
+
+
+@event.listens_for(Session, "before_flush")
+def _acquire_write_lock(session, flush_context, instances):
+    """Serialize writing sessions within the worker, from first flush to commit."""
+    sqlite_guard.acquire(session)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_write_lock(session, transaction):
+    """Release the write lock when the outermost transaction commits or rolls back."""
+    if transaction.parent is None:
+        sqlite_guard.release(session)
@@ -42,6 +42,73 @@ class TestApp(TestCase):
                 table_name = model.__table__.name
                 self.assertIn(table_name, all_db_tables)
 
+    def test_upgrade_schema_skips_columns_added_meanwhile(self):
+        # Ensure a column another worker added after the check does not fail
+        # the upgrade
+        from unittest import mock
+        from models.person import Person
+        import storage.schema as schema
+
+        column = Person.__table__.c.role_version
+        with mock.patch.object(
+            schema, "missing_columns", side_effect=[[column], []]
+        ):
+            self.assertEqual(schema.upgrade_schema(db), [])
+
+    def test_missing_indexes_created(self):
+        # Ensure indexes missing from an older database are reported and created
+        from sqlalchemy import text
+        from storage.schema import create_missing_indexes, report_missing_indexes
+
+        self.assertEqual(report_missing_indexes(db), [])
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_visits_patient_id"))
+        missing = report_missing_indexes(db)
+        self.assertEqual([index.name for index in missing], ["ix_visits_patient_id"])
+        self.assertEqual(create_missing_indexes(db), missing)
+        self.assertEqual(report_missing_indexes(db), [])
+
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_visits_patient_id"))
+        result = self.app.test_cli_runner().invoke(args=["create-indexes"])
+        self.assertIn("Created 1 missing indexes.", result.output)
+        self.assertEqual(report_missing_indexes(db), [])
+
+    def test_unique_jti_index_after_duplicates(self):
+        # Ensure duplicate block list rows from older releases do not stop the
+        # unique index on jti from being built
+        from sqlalchemy import text
+        from auth.blocklist import TokenBlockList
+        from storage.schema import report_missing_indexes
+
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_block_list_jti"))
+            for _ in range(2):
+                connection.execute(
+                    text("INSERT INTO block_list (jti, created_at) VALUES ('dup', '2024-01-01')")
+                )
+        result = self.app.test_cli_runner().invoke(args=["create-indexes"])
+        self.assertIn("Created 1 missing indexes.", result.output)
+        self.assertEqual(report_missing_indexes(db), [])
+        self.assertEqual(TokenBlockList.query.filter_by(jti="dup").count(), 1)
+
+    def test_query_profiling(self):
+        # Ensure SQL statements are counted per request and repeats are reported
+        from storage.profiling import query_profiler
+
+        response = self.client.get("/api/v1/roles")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(int(response.headers["X-DB-Query-Count"]), 1)
+        self.assertIn("X-DB-Query-Time-Ms", response.headers)
+
+        query_profiler.threshold = 0
+        try:
+            with self.assertLogs(level="WARNING") as logs:
+                self.client.get("/api/v1/roles")
+        finally:
+            query_profiler.threshold = self.app.config["SQL_REPEATED_QUERY_THRESHOLD"]
+        self.assertIn("GET /api/v1/roles ran a query", logs.output[0])
+
     def test_jwt_initialization(self):
         # Ensure JWT initialization is successful
         self.assertTrue(self.app.extensions.get("flask-jwt-extended"))
@@ -1,4 +1,5 @@
 import http
+import time
 from flask_testing import TestCase
 import unittest
 from app import create_app
@@ -24,6 +25,8 @@ class TestAuth(TestCase):
         self.assertNotEqual(
             response.json["access_token"], response.json["refresh_token"]
         )
+        self.assertEqual(response.json["user"]["__class__"], "User")
+        self.assertEqual(response.json["user"]["roles"][0]["name"], "admin")
         response2 = self.client.post(
             "/api/v1/login", 
             json={"phone_no": "+254700000001", "password": self.admins_passwd},
@@ -52,6 +55,232 @@ class TestAuth(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response2.status_code, 401)
 
+    def test_logout_all(self):
+        """Logging out of all sessions revokes every earlier token."""
+        first = self.get_user_tokens(self.admins_phone, self.admins_passwd)
+        second = self.get_user_tokens(self.admins_phone, self.admins_passwd)
+        headers = {"Authorization": f"Bearer {first['access_token']}"}
+        response = self.client.post("/api/v1/logout-all", headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        headers = {"Authorization": f"Bearer {second['access_token']}"}
+        response = self.client.get("/api/v1/users", headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.refresh(second).status_code, 401)
+
+        third = self.get_user_tokens(self.admins_phone, self.admins_passwd)
+        headers = {"Authorization": f"Bearer {third['access_token']}"}
+        response = self.client.get("/api/v1/users", headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_blocklist_cache(self):
+        """Revoked tokens are answered from the cache, others are not blocked."""
+        from auth.blocklist import TokenBlockList, blocklist_cache
+
+        token = {"jti": "revoked-jti", "exp": int(time.time()) + 60}
+        self.assertFalse(TokenBlockList.is_jti_blocklisted("never-issued"))
+        TokenBlockList.revoke(token)
+        TokenBlockList.revoke(token)  # revoking twice is a no-op
+        self.assertTrue(TokenBlockList.is_jti_blocklisted("revoked-jti"))
+
+        blocklist_cache.reset()  # a fresh worker loads it from the database
+        self.assertTrue(TokenBlockList.is_jti_blocklisted("revoked-jti"))
+
+    def test_verified_token_cache(self):
+        """Verified claims are reused, but revocation still applies."""
+        from auth.token_cache import verified_tokens
+
+        tokens = self.get_user_tokens(self.admins_phone, self.admins_passwd)
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        self.assertIsNone(verified_tokens.get(tokens["access_token"]))
+        response = self.client.get("/api/v1/users", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        claims = verified_tokens.get(tokens["access_token"])
+        self.assertIsNotNone(claims)
+        self.assertIsNone(verified_tokens.get(tokens["access_token"] + "x"))
+
+        body = {"refresh_token": tokens["refresh_token"]}
+        self.client.post("/api/v1/logout", headers=headers, json=body)
+        response = self.client.get("/api/v1/users", headers=headers)
+        self.assertEqual(response.status_code, 401)
+
+        verified_tokens.put("expired", {**claims, "exp": int(time.time()) - 1})
+        self.assertIsNone(verified_tokens.get("expired"))
+
+    def test_clean_block_list(self):
+        """Only entries whose token has expired are purged."""
+        from auth.blocklist import TokenBlockList
+
+        now = int(time.time())
+        TokenBlockList.revoke(
+            {"jti": "expired-jti", "exp": now - 1},
+            {"jti": "live-jti", "exp": now + 60},
+        )
+        self.assertGreaterEqual(TokenBlockList.clean_block_list(now=now), 1)
+        remaining = {row.jti for row in TokenBlockList.query.all()}
+        self.assertNotIn("expired-jti", remaining)
+        self.assertIn("live-jti", remaining)
+
+    def test_outdated_hash_upgraded_on_login(self):
+        """A hash made with an older method is replaced on the next login."""
+        from werkzeug.security import generate_password_hash
+        from app import db
+        from auth.hashing import password_hasher
+        from models.person import Person
+
+        admin = Person.find_by_phone_no(self.admins_phone)
+        admin.password_hash = generate_password_hash(
+            self.admins_passwd, "pbkdf2:sha256:1000"
+        )
+        db.session.commit()
+        self.assertTrue(password_hasher.needs_rehash(admin.password_hash))
+
+        tokens = self.get_user_tokens(self.admins_phone, self.admins_passwd)
+        self.assertIsNotNone(tokens["access_token"])
+        db.session.refresh(admin)
+        self.assertFalse(password_hasher.needs_rehash(admin.password_hash))
+
+    def test_needs_rehash_with_default_parameters(self):
+        """A method given without its default parameters matches the hashes."""
+        from auth.hashing import PasswordHasher
+
+        hasher = PasswordHasher()
+        for method in ("scrypt", "pbkdf2", "pbkdf2:sha256"):
+            hasher.method = method
+            self.assertFalse(hasher.needs_rehash(hasher.hash(self.admins_passwd)))
+        hasher.method = "scrypt"
+        self.assertTrue(hasher.needs_rehash("scrypt:16384:8:1$salt$hash"))
+
+    def test_password_hasher_pool(self):
+        """Hashing in a process pool gives the same results as inline."""
+        from auth.hashing import PasswordHasher
+
+        hasher = PasswordHasher()
+        hasher.method = "pbkdf2:sha256:1000"
+        hasher.workers = 1
+        try:
+            password_hash = hasher.hash(self.admins_passwd)
+            self.assertTrue(hasher.verify(password_hash, self.admins_passwd))
+            self.assertFalse(hasher.verify(password_hash, "wrong-password1"))
+        finally:
+            hasher.shutdown()
+
+    def test_login_rate_limited(self):
+        """Repeated logins for one phone number are throttled with a 429."""
+        body = {"phone_no": self.admins_phone, "password": "wrongPassword1"}
+        for _ in range(5):
+            response = self.client.post("/api/v1/login", json=body)
+            self.assertEqual(response.status_code, 401)
+        response = self.client.post("/api/v1/login", json=body)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+        self.assertIn("error", response.json)
+
+    def test_memory_bucket_store_evicts_oldest(self):
+        """A full in-process store forgets its least recently used bucket."""
+        from auth.rate_limit import MemoryBucketStore
+
+        store = MemoryBucketStore()
+        store.max_keys = 2
+        now = time.time()
+        self.assertEqual(store.take("a", 1, 0.5, now), (True, 0))
+        self.assertEqual(store.take("b", 1, 0.5, now), (True, 0))
+        self.assertFalse(store.take("a", 1, 0.5, now)[0])
+        store.take("c", 1, 0.5, now)  # drops "b", used longest ago
+        self.assertFalse(store.take("a", 1, 0.5, now)[0])
+        self.assertEqual(store.take("b", 1, 0.5, now), (True, 0))
+
+    def test_sqlite_bucket_store(self):
+        """Buckets in a SQLite file are shared between store instances."""
+        import os
+        import tempfile
+        from auth.rate_limit import SqliteBucketStore
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ratelimit.db")
+            now = time.time()
+            self.assertEqual(SqliteBucketStore(path).take("k", 1, 0.5, now), (True, 0))
+            allowed, retry_after = SqliteBucketStore(path).take("k", 1, 0.5, now)
+            self.assertFalse(allowed)
+            self.assertAlmostEqual(retry_after, 2)
+
+    def test_sms_backend_required_in_production(self):
+        """Outside debug and testing, the console SMS backend is refused."""
+        from flask import Flask
+        from auth.sms import SmsSender
+
+        app = Flask(__name__)
+        with self.assertRaises(ValueError):
+            SmsSender().init_app(app)
+        app.config["SMS_BACKEND"] = "console://"
+        with self.assertRaises(ValueError):
+            SmsSender().init_app(app)
+        app.testing = True
+        SmsSender().init_app(app)
+
+    def test_reset_password_with_code(self):
+        """A password reset needs the code sent by SMS, and uses it up."""
+        from auth.sms import MemorySmsBackend, sms_sender
+
+        sms_sender.backend = MemorySmsBackend()
+        response = self.client.post(
+            "/api/v1/forgot-password", json={"phone_no": self.admins_phone}
+        )
+        self.assertEqual(response.status_code, 200)
+        phone_no, message = sms_sender.backend.outbox[-1]
+        self.assertEqual(phone_no, self.admins_phone)
+        code = message.split("code is ")[1][:6]
+
+        body = {
+            "phone_no": self.admins_phone,
+            "password": self.admins_passwd,
+            "password_confirm": self.admins_passwd,
+        }
+        wrong_code = "000000" if code != "000000" else "111111"
+        response = self.client.post(
+            "/api/v1/reset-password", json={**body, "code": wrong_code}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/v1/reset-password", json={**body, "code": code})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/api/v1/reset-password", json={**body, "code": code})
+        self.assertEqual(response.status_code, 400)
+
+    def test_one_time_code_limits(self):
+        """Codes stop working once expired or after too many wrong guesses."""
+        from auth.otp import OneTimeCode
+
+        now = int(time.time())
+        code = OneTimeCode.issue("+254700000009", now=now - 3600)
+        self.assertFalse(OneTimeCode.verify("+254700000009", code))
+
+        code = OneTimeCode.issue("+254700000009")
+        wrong_code = "000000" if code != "000000" else "111111"
+        for _ in range(self.app.config["OTP_MAX_ATTEMPTS"]):
+            self.assertFalse(OneTimeCode.verify("+254700000009", wrong_code))
+        self.assertFalse(OneTimeCode.verify("+254700000009", code))
+
+        OneTimeCode.issue("+254700000008", now=now - 3600)
+        self.assertGreaterEqual(OneTimeCode.purge_expired(now=now), 1)
+        self.assertIsNone(OneTimeCode.query.filter_by(phone_no="+254700000008").first())
+
+    def test_one_time_code_issued_after_concurrent_insert(self):
+        """A code row another worker just inserted is replaced, not a 500."""
+        from sqlalchemy import text
+        from app import db
+        from auth.otp import OneTimeCode
+
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(
+                    "INSERT INTO one_time_codes (phone_no, code_hash, expires_at, "
+                    "attempts) VALUES ('+254700000007', 'x', :expires, 3)"
+                ),
+                {"expires": int(time.time()) + 600},
+            )
+        code = OneTimeCode.issue("+254700000007")
+        self.assertTrue(OneTimeCode.verify("+254700000007", code))
+
     def get_access_token_for_user(self, phone_no, password):
         # Helper function to get the access token for a user
         phone_no = self.admins_phone
@@ -0,0 +1,56 @@
+"""Module for testing locations."""
+
+import unittest
+from app import create_app, db
+
+
+class TestLocation(unittest.TestCase):
+    def create_app(self):
+        app = create_app()
+        self.app = app
+        return app
+
+    def setUp(self):
+        self.app = self.create_app()
+        self.client = self.app.test_client
+
+    def create_location(self, name, tag, parent_id=None):
+        """Create a location through the API and return its id."""
+        res = self.client().post(
+            "/api/v1/locations", json={"name": name, "tag": tag, "parent_id": parent_id}
+        )
+        self.assertEqual(res.status_code, 201)
+        return res.json["location"]["id"]
+
+    def test_list_locations_in_constant_queries(self):
+        """Test listing locations does not query once per location."""
+        county = self.create_location("kisumu", "county")
+        subcounty = self.create_location("nyando", "subcounty", county)
+        url = f"/api/v1/locations/tags/village?parent_id={subcounty}"
+
+        self.create_location("village a", "village", subcounty)
+        res = self.client().get(url)
+        self.assertEqual(res.status_code, 200)
+        queries = res.headers["X-DB-Query-Count"]
+
+        for name in ["village b", "village c", "village d"]:
+            self.create_location(name, "village", subcounty)
+        res = self.client().get(url)
+        self.assertEqual(res.headers["X-DB-Query-Count"], queries)
+        self.assertEqual(len(res.json["locations"]), 4)
+        self.assertEqual(res.json["locations"][0]["parent"], "Nyando")
+        self.assertEqual(res.json["locations"][0]["tag"]["name"], "village")
+
+        res = self.client().get(f"{url}&limit=3")
+        self.assertEqual(len(res.json["locations"]), 3)
+        res = self.client().get(f"{url}&limit=3&cursor={res.headers['X-Next-Cursor']}")
+        self.assertEqual([l["name"] for l in res.json["locations"]], ["Village d"])
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,221 @@
+"""Module for testing patients."""
+
+import unittest
+from app import create_app, db
+
+
+class TestPatient(unittest.TestCase):
+    def create_app(self):
+        app = create_app()
+        self.app = app
+        return app
+
+    def setUp(self):
+        self.app = self.create_app()
+        self.client = self.app.test_client
+        self.patient_data = {
+            "first_name": "Jane",
+            "surname": "Doe",
+            "phone_no": "+254711111111",
+            "role": "patient",
+            "sex": "female",
+            "password": "pass1234",
+            "birth_date": "1990-01-01T00:00:00",
+        }
+        self.current_user_tokens = self.client().post(
+            "/api/v1/login", json={"phone_no": "+254700000000", "password": "1Admin234"}
+        )
+        self.auth_header = {
+            "Authorization": f'Bearer {self.current_user_tokens.json["access_token"]}'
+        }
+
+    def create_patient(self, **data):
+        """Create a patient through the API and return the response."""
+        return self.client().post(
+            "/api/v1/patients",
+            json={**self.patient_data, **data},
+            headers=self.auth_header,
+        )
+
+    def patient_header(self):
+        """Log in as the test patient and return the auth header."""
+        res = self.client().post(
+            "/api/v1/login",
+            json={
+                "phone_no": self.patient_data["phone_no"],
+                "password": self.patient_data["password"],
+            },
+        )
+        return {"Authorization": f'Bearer {res.json["access_token"]}'}
+
+    def test_patient_creation(self):
+        res = self.create_patient()
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json["__class__"], "Patient")
+        self.assertEqual(res.json["roles"][0]["name"], "patient")
+
+    def test_get_patient_self(self):
+        """Test a logged in patient can fetch their own details."""
+        self.create_patient()
+        header = self.patient_header()
+        res = self.client().get("/api/v1/patients/me", headers=header)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json["phone_no"], self.patient_data["phone_no"])
+        res = self.client().get("/api/v1/patients/me/present_pregnancy", headers=header)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json, [])
+
+    def test_revoke_patient_tokens(self):
+        """Test an admin can revoke a patient's tokens, e.g. after a lost phone."""
+        patient_id = self.create_patient().json["id"]
+        header = self.patient_header()
+        res = self.client().post(
+            f"/api/v1/users/{patient_id}/revoke-tokens", headers=self.auth_header
+        )
+        self.assertEqual(res.status_code, 200)
+        res = self.client().get("/api/v1/patients/me", headers=header)
+        self.assertEqual(res.status_code, 401)
+
+    def test_present_pregnancy_of_missing_patient(self):
+        """Test present pregnancies of an unknown patient are a 404."""
+        for url in [
+            "/api/v1/patients/999999/present_pregnancy",
+            "/api/v1/patients/999999/present_pregnancy/1",
+        ]:
+            res = self.client().get(url, headers=self.auth_header)
+            self.assertEqual(res.status_code, 404)
+            self.assertEqual(res.json["message"], "Patient not found")
+
+    def test_patient_cannot_list_patients(self):
+        self.create_patient()
+        res = self.client().get("/api/v1/patients", headers=self.patient_header())
+        self.assertEqual(res.status_code, 403)
+
+    def test_list_patients(self):
+        """Test patients are listed page by page, filtered and sorted."""
+        for i, (sex, year) in enumerate(
+            [("female", 1995), ("male", 1980), ("female", 1985), ("female", 1990)]
+        ):
+            res = self.create_patient(
+                phone_no=f"+25471111112{i}", sex=sex, birth_date=f"{year}-01-01T00:00:00"
+            )
+            self.assertEqual(res.status_code, 201)
+
+        seen, url = [], "/api/v1/patients?limit=3&sort=birth_date&order=desc"
+        res = self.client().get(url, headers=self.auth_header)
+        self.assertEqual(res.headers["X-Total-Estimate"], "4")
+        while True:
+            self.assertEqual(res.status_code, 200)
+            seen.extend(patient["phone_no"] for patient in res.json)
+            if "X-Next-Cursor" not in res.headers:
+                break
+            self.assertIn('rel="next"', res.headers["Link"])
+            res = self.client().get(
+                f"{url}&cursor={res.headers['X-Next-Cursor']}", headers=self.auth_header
+            )
+        self.assertEqual(seen, [f"+25471111112{i}" for i in (0, 3, 2, 1)])
+
+        res = self.client().get(
+            "/api/v1/patients?sex=female&birth_date_from=1985-01-01"
+            "&birth_date_to=1995-01-01",
+            headers=self.auth_header,
+        )
+        self.assertEqual([p["phone_no"] for p in res.json], ["+254711111122", "+254711111123"])
+        self.assertEqual(res.headers["X-Total-Estimate"], "2")
+
+        for query in ["limit=0", "sort=phone_no", "order=up", "cursor=bogus"]:
+            res = self.client().get(f"/api/v1/patients?{query}", headers=self.auth_header)
+            self.assertEqual(res.status_code, 400)
+
+    def test_patient_appointments(self):
+        """Test appointments are listed by date, within a date range."""
+        patient_id = self.create_patient().json["id"]
+        for day, status in [(3, "booked"), (1, "booked"), (2, "cancelled"), (2, "booked")]:
+            res = self.client().post(
+                "/api/v1/appointments",
+                json={
+                    "patient_id": patient_id,
+                    "appointment_date": f"2024-05-0{day}T09:00:00",
+                    "appointment_type": "anc",
+                    "appointment_status": status,
+                },
+                headers=self.auth_header,
+            )
+            self.assertEqual(res.status_code, 201)
+
+        url = f"/api/v1/appointments/patient/{patient_id}?from=2024-05-02&to=2024-05-04"
+        res = self.client().get(f"{url}&limit=2", headers=self.auth_header)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["X-Total-Estimate"], "3")
+        self.assertEqual([a["id"] for a in res.json], [3, 4])
+        res = self.client().get(
+            f"{url}&limit=2&cursor={res.headers['X-Next-Cursor']}",
+            headers=self.auth_header,
+        )
+        self.assertEqual([a["id"] for a in res.json], [1])
+
+        res = self.client().get(f"{url}&status=booked&order=desc", headers=self.auth_header)
+        self.assertEqual([a["id"] for a in res.json], [1, 4])
+
+    def test_sparse_fieldsets(self):
+        """Test ?fields= narrows both the columns loaded and the output."""
+        from sqlalchemy import event
+
+        patient_id = self.create_patient().json["id"]
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            res = self.client().get(
+                "/api/v1/patients?fields=first_name,phone_no&sort=birth_date",
+                headers=self.auth_header,
+            )
+        finally:
+            with self.app.app_context():
+                event.remove(db.engine, "before_cursor_execute", record)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(set(res.json[0]), {"__class__", "first_name", "phone_no"})
+        listing = [s for s in statements if s.startswith("SELECT patients.id")][-1]
+        self.assertIn("persons.phone_no", listing)
+        self.assertNotIn("next_of_kin", listing)
+        self.assertNotIn("password_hash", listing)
+
+        res = self.client().get(
+            f"/api/v1/patients/{patient_id}?fields=surname,roles", headers=self.auth_header
+        )
+        self.assertEqual(set(res.json), {"__class__", "surname", "roles"})
+
+        res = self.client().post(
+            f"/api/v1/patients/{patient_id}/present_pregnancy",
+            json={"date": "2024-05-01", "number_of_contacts": 1, "muac": 23.5},
+            headers=self.auth_header,
+        )
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get(
+            f"/api/v1/patients/{patient_id}/present_pregnancy?fields=date,muac,bogus",
+            headers=self.auth_header,
+        )
+        self.assertEqual(res.json, [{"date": "2024-05-01", "muac": 23.5}])
+
+    def test_invalid_token(self):
+        """Test a bad token is rejected where required and ignored elsewhere."""
+        header = {"Authorization": "Bearer not-a-token"}
+        res = self.client().get("/api/v1/patients", headers=header)
+        self.assertEqual(res.status_code, 422)
+        res = self.client().get("/api/v1/status", headers=header)
+        self.assertEqual(res.status_code, 200)
+        res = self.client().get("/api/v1/patients")
+        self.assertEqual(res.status_code, 401)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,318 @@
+"""Module for testing the storage engine."""
+
+from flask_testing import TestCase
+import unittest
+from app import create_app
+
+
+class TestDbStorage(TestCase):
+    def create_app(self):
+        app = create_app()
+        self.app = app
+        return app
+
+    def test_page(self):
+        """Pages follow each other without gaps or repeats, in both orders."""
+        from models.location import Tag
+        from storage import storage
+
+        ids = sorted(tag.id for tag in storage.all(Tag))
+        for order, expected in (("asc", ids), ("desc", ids[::-1])):
+            seen, cursor = [], None
+            while True:
+                items, cursor = storage.page(Tag, after_id=cursor, limit=3, order=order)
+                seen.extend(item.id for item in items)
+                if cursor is None:
+                    break
+            self.assertEqual(seen, expected)
+
+        with self.assertRaises(ValueError):
+            storage.page(Tag, order="sideways")
+
+    def test_page_subclass_seeks_on_base_table(self):
+        """Subclass pages seek and order on the base table's (sort, id) index."""
+        from sqlalchemy import event
+        from models.user import User
+        from storage import storage
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(storage.db.engine, "before_cursor_execute", listener)
+        try:
+            admin = storage.page(User, limit=1)[0][0]
+            after = (admin.created_at, admin.id)
+            storage.page(User, after_id=after, sort=User.created_at)
+        finally:
+            event.remove(storage.db.engine, "before_cursor_execute", listener)
+        self.assertIn("ORDER BY persons.id ASC", statements[0])
+        self.assertIn("(persons.created_at, persons.id) >", statements[-1])
+        self.assertIn(
+            "ORDER BY persons.created_at ASC, persons.id ASC", statements[-1]
+        )
+
+    def test_iterate(self):
+        """Iterating in small batches yields every object once."""
+        from models.location import Tag
+        from storage import storage
+
+        ids = [tag.id for tag in storage.iterate(Tag, batch_size=2)]
+        self.assertEqual(sorted(ids), sorted(tag.id for tag in storage.all(Tag)))
+        query = storage.db.session.query(Tag).filter(Tag.id <= 2)
+        self.assertEqual(len(list(storage.iterate(Tag, query=query))), 2)
+
+    def test_get_many(self):
+        """Objects come back in input order, with None for unknown ids."""
+        from models.location import Tag
+        from models.person import Person
+        from models.user import User
+        from storage import storage
+
+        first, second = storage.page(Tag, limit=2)[0]
+        self.assertEqual(
+            storage.get_many(Tag, [second.id, 999999, str(first.id), None]),
+            [second, None, first, None],
+        )
+        # the admin is loaded as a User through the Person base class
+        admin = Person.find_by_phone_no("+254700000000")
+        self.assertIs(storage.get_many(Person, [admin.id])[0], admin)
+        self.assertIsInstance(storage.get_many(Person, [admin.id])[0], User)
+        self.assertEqual(storage.get_many(Tag, []), [])
+
+    def test_count(self):
+        """Cached counts follow committed ORM changes and refresh on schedule."""
+        from sqlalchemy import text
+        from models.location import Tag
+        from storage import storage
+        from storage.counts import row_counts
+
+        session = storage.db.session
+        count = storage.count(Tag)
+        session.execute(text("INSERT INTO tags (name) VALUES ('count-raw')"))
+        session.commit()
+        self.assertEqual(storage.count(Tag), count)  # not seen until a refresh
+
+        tag = Tag(name="count-orm")
+        storage.new(tag)
+        storage.save()
+        self.assertEqual(storage.count(Tag), count + 1)
+        storage.new(Tag(name="count-rolled-back"))
+        session.flush()
+        session.rollback()
+        self.assertEqual(storage.count(Tag), count + 1)
+        storage.bulk_new(Tag, [{"name": "count-bulk"}])
+        storage.save()
+        self.assertEqual(storage.count(Tag), count + 2)
+
+        row_counts.refresh_interval = 0
+        self.assertEqual(storage.count(Tag), count + 3)
+        session.execute(text("DELETE FROM tags WHERE name LIKE 'count-%'"))
+        session.commit()
+        self.assertEqual(storage.count(Tag), count)
+
+    def test_unit_of_work(self):
+        """Changes in a unit of work are committed once, or not at all."""
+        from sqlalchemy import event
+        from models.location import Tag
+        from storage import storage
+
+        commits = []
+        session = storage.db.session
+        record = commits.append
+        event.listen(session(), "after_commit", record)
+        try:
+            with storage.unit_of_work():
+                storage.new(Tag(name="uow-a"))
+                with storage.unit_of_work():  # joins the outer unit of work
+                    storage.new(Tag(name="uow-b"))
+                self.assertEqual(commits, [])
+            self.assertEqual(len(commits), 1)
+
+            with self.assertRaises(ValueError):
+                with storage.unit_of_work():
+                    storage.new(Tag(name="uow-c"))
+                    raise ValueError("abandon")
+            tags = session.query(Tag).filter(Tag.name.like("uow-%"))
+            self.assertEqual({tag.name for tag in tags}, {"uow-a", "uow-b"})
+        finally:
+            event.remove(session(), "after_commit", record)
+            session.query(Tag).filter(Tag.name.like("uow-%")).delete()
+            session.commit()
+
+    def test_bulk_new_and_upsert(self, dialects=None):
+        """Bulk inserts return ids, and upserts update or skip existing rows."""
+        from unittest import mock
+        from models.location import Tag
+        from storage import storage
+        import storage.db_storage as db_storage
+
+        if dialects is not None:
+            patch = mock.patch.dict(db_storage.UPSERT_INSERTS, dialects, clear=True)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        ids = storage.bulk_new(
+            Tag, [{"name": "bulk-a"}, Tag(name="bulk-b")], chunk_size=1
+        )
+        self.assertEqual(len(ids), 2)
+        storage.bulk_upsert(
+            Tag,
+            [{"name": "bulk-a", "parent_id": ids[1]}, {"name": "bulk-c"}],
+            ["name"],
+            update_columns=["parent_id"],
+        )
+        storage.bulk_upsert(Tag, [{"name": "bulk-a", "parent_id": None}], ["name"])
+        tags = dict(
+            storage.db.session.query(Tag.name, Tag.parent_id).filter(
+                Tag.name.like("bulk-%")
+            )
+        )
+        self.assertEqual(tags, {"bulk-a": ids[1], "bulk-b": None, "bulk-c": None})
+        storage.db.session.rollback()
+
+    def test_bulk_upsert_without_on_conflict(self):
+        """Upserts select existing rows first on databases without ON CONFLICT."""
+        self.test_bulk_new_and_upsert(dialects={})
+
+    def test_tags_hierarchy(self):
+        """Every seeded tag's parent is the tag before it in the hierarchy."""
+        from auth.validators import TAGS_HIERARCHY
+        from models.location import Tag
+        from storage import storage
+
+        tags = {tag.name: tag for tag in storage.all(Tag)}
+        for index, name in enumerate(TAGS_HIERARCHY[1:], start=1):
+            self.assertEqual(tags[name].parent_id, tags[TAGS_HIERARCHY[index - 1]].id)
+        self.assertIsNone(tags[TAGS_HIERARCHY[0]].parent_id)
+
+    def test_sqlite_guard(self):
+        """SQLite runs in WAL mode, and locked writes are retried."""
+        import sqlite3
+        import threading
+        from sqlalchemy import text
+        from app import db
+        from auth.blocklist import TokenBlockList
+        from storage.sqlite import sqlite_guard
+
+        pragma = lambda name: db.session.execute(text(f"PRAGMA {name}")).scalar()
+        self.assertEqual(pragma("journal_mode"), "wal")
+        self.assertEqual(pragma("busy_timeout"), 5000)
+        db.session.rollback()
+
+        # another worker holds the write lock for a moment
+        path = self.app.config["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):]
+        other = sqlite3.connect(path, check_same_thread=False)
+        other.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.05, other.commit).start()
+        sqlite_guard.backoff = 0.05
+        db.session.execute(text("PRAGMA busy_timeout=0"))
+        try:
+            db.session.add(TokenBlockList(jti="retried"))
+            db.session.flush()
+            self.assertTrue(sqlite_guard._lock.locked())
+            db.session.commit()
+        finally:
+            db.session.execute(text("PRAGMA busy_timeout=5000"))
+            other.close()
+        self.assertFalse(sqlite_guard._lock.locked())
+        self.assertEqual(TokenBlockList.query.filter_by(jti="retried").count(), 1)
+
+    def test_read_replicas(self):
+        """GET requests read from healthy replicas in turn, writes do not."""
+        import os
+        import sqlite3
+        import tempfile
+        from storage.replicas import replica_router
+
+        login = self.client.post(
+            "/api/v1/login", json={"phone_no": "+254700000000", "password": "1Admin234"}
+        )
+        headers = {"Authorization": f'Bearer {login.json["access_token"]}'}
+        primary = self.app.config["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):]
+        with tempfile.TemporaryDirectory() as directory:
+            uris = []
+            for name in ("Replica One", "Replica Two"):
+                path = os.path.join(directory, f"{len(uris)}.db")
+                with sqlite3.connect(primary) as source, sqlite3.connect(
+                    path
+                ) as connection:
+                    source.backup(connection)
+                    connection.execute(
+                        "UPDATE persons SET first_name = ? WHERE phone_no = ?",
+                        (name, "+254700000000"),
+                    )
+                uris.append(f"sqlite:///{path}")
+            missing = os.path.join(directory, "missing", "replica.db")
+            try:
+                replica_router.connect([*uris, f"sqlite:///{missing}"])
+
+                names = [
+                    self.client.get("/api/v1/users", headers=headers).json[0][
+                        "first_name"
+                    ]
+                    for _ in range(4)
+                ]
+                # the unreachable replica is skipped
+                self.assertEqual(
+                    names, ["Replica One", "Replica Two", "Replica One", "Replica Two"]
+                )
+                res = self.client.get("/api/v1/status")
+                self.assertEqual(res.status_code, 200)
+            finally:
+                replica_router.dispose()
+        res = self.client.get("/api/v1/users", headers=headers)
+        self.assertEqual(res.json[0]["first_name"], "Root Admin")
+
+
+    def test_replica_failures_and_primary_reads(self):
+        """Failed replica queries fall back to the primary; identity reads never lag."""
+        import os
+        import sqlite3
+        import tempfile
+        from app import db
+        from auth.identity import RequestIdentity
+        from models.person import Person
+        from storage.replicas import reads_from_primary, replica_router
+
+        login = self.client.post(
+            "/api/v1/login", json={"phone_no": "+254700000000", "password": "1Admin234"}
+        )
+        headers = {"Authorization": f'Bearer {login.json["access_token"]}'}
+        admin_id = Person.find_by_phone_no("+254700000000").id
+        primary = self.app.config["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replica.db")
+            with sqlite3.connect(primary) as source, sqlite3.connect(path) as connection:
+                source.backup(connection)
+                connection.execute(
+                    "UPDATE persons SET first_name = 'Stale' WHERE phone_no = ?",
+                    ("+254700000000",),
+                )
+            try:
+                replica_router.connect([f"sqlite:///{path}"])
+                with self.app.test_request_context("/api/v1/users"):
+                    replica_router.route_request()
+                    query = db.session.query(Person.first_name).filter(
+                        Person.id == admin_id
+                    )
+                    name = lambda: query.scalar()
+                    self.assertEqual(name(), "Stale")
+                    with reads_from_primary():
+                        self.assertEqual(name(), "Root Admin")
+                    person = RequestIdentity({"sub": admin_id}).person
+                    self.assertEqual(person.first_name, "Root Admin")
+                    replica_router.end_request()
+                    db.session.remove()
+
+                # the probe passes, but the query itself fails on the replica
+                with sqlite3.connect(path) as connection:
+                    connection.execute("DROP TABLE users")
+                res = self.client.get("/api/v1/users", headers=headers)
+                self.assertEqual(res.status_code, 200)
+                self.assertEqual(res.json[0]["first_name"], "Root Admin")
+                self.assertIsNone(replica_router.choose())
+            finally:
+                replica_router.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -107,6 +107,41 @@ class TestUser(unittest.TestCase):
         self.assertTrue(res.json[0]["first_name"] == "Root Admin")
         self.assertTrue(len(res.json) == 1)
 
+    def test_filter_users(self):
+        """Test users can be listed by facility and role, a page at a time."""
+        for i, (role, facility) in enumerate(
+            [("provider", "7"), ("admin", "7"), ("provider", "7"), ("provider", "8")]
+        ):
+            res = self.client().post(
+                "/api/v1/users",
+                json={
+                    **self.user_data,
+                    "phone_no": f"+25470456789{i}",
+                    "role": role,
+                    "facility_id": facility,
+                },
+                headers=self.auth_header,
+            )
+            self.assertEqual(res.status_code, 201)
+
+        res = self.client().get(
+            "/api/v1/users?facility_id=7&role=provider&limit=1", headers=self.auth_header
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers["X-Total-Estimate"], "2")
+        self.assertEqual([user["phone_no"] for user in res.json], ["+254704567890"])
+        self.assertEqual(res.json[0]["roles"][0]["name"], "provider")
+        res = self.client().get(
+            "/api/v1/users?facility_id=7&role=provider&limit=1"
+            f"&cursor={res.headers['X-Next-Cursor']}",
+            headers=self.auth_header,
+        )
+        self.assertEqual([user["phone_no"] for user in res.json], ["+254704567892"])
+        self.assertNotIn("X-Next-Cursor", res.headers)
+
+        res = self.client().get("/api/v1/users?role=admin", headers=self.auth_header)
+        self.assertEqual(len(res.json), 2)
+
     def test_get_user_by_id(self):
         """Test API can get a single user by using it's id."""
         res = self.client().get("/api/v1/users/1", headers=self.auth_header)
@@ -129,6 +164,49 @@ class TestUser(unittest.TestCase):
         )
         self.assertTrue(res.status_code, 404)
 
+    def test_role_change_outdates_token_roles(self):
+        """Test a token stops granting a role once the role is removed."""
+        res = self.client().post(
+            "/api/v1/users", json=self.user_data, headers=self.auth_header
+        )
+        self.assertEqual(res.status_code, 201)
+        user_id = res.json["id"]
+        login = self.client().post(
+            "/api/v1/login",
+            json={
+                "phone_no": self.user_data["phone_no"],
+                "password": self.user_data["password"],
+            },
+        )
+        with self.app.app_context():
+            from flask_jwt_extended import decode_token
+
+            claims = decode_token(login.json["access_token"])
+        self.assertEqual(claims["roles"], ["admin"])
+        user_header = {"Authorization": f'Bearer {login.json["access_token"]}'}
+        res = self.client().get("/api/v1/users", headers=user_header)
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client().put(
+            f"/api/v1/users/{user_id}",
+            json={"remove_role": "admin"},
+            headers=self.auth_header,
+        )
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get("/api/v1/users", headers=user_header)
+        self.assertEqual(res.status_code, 403)
+
+    def test_db_pool_stats(self):
+        """Administrators can read the connection pool metrics."""
+        res = self.client().get("/api/v1/stats/db-pool", headers=self.auth_header)
+        self.assertEqual(res.status_code, 200)
+        primary = res.json["primary"]
+        self.assertGreater(primary["checkouts"], 0)
+        self.assertIn("checkout_wait_ms", primary)
+        options = self.app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+        self.assertEqual(primary["max_overflow"], options["max_overflow"])
+        self.assertEqual(self.client().get("/api/v1/stats/db-pool").status_code, 401)
+
     def test_provider_cannot_create_admin(self):
         """Test provider user cannot create admin user."""
         pass